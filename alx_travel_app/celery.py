@@ -2,6 +2,10 @@ import os
 from celery import Celery
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alx_travel_app.settings')
+# Skip Django system checks when a worker boots: they import the URLconf
+# and with it every view module (DRF views, requests). Checks still run
+# for runserver/migrate; set CELERY_SKIP_CHECKS= (empty) to run them here.
+os.environ.setdefault('CELERY_SKIP_CHECKS', 'true')
 
 app = Celery('alx_travel_app')
 
@@ -0,0 +1,209 @@
+# listings/archive.py
+"""
+Archival of old bookings together with their payment and reviews.
+
+Bookings created and checked out before the horizon, whose payment is
+settled and whose payment and reviews were also last touched before it
+(see archivable()), are moved, in batches, out of the hot tables into
+gzip-compressed NDJSON segments under
+settings.ARCHIVE_DIR, partitioned by month of creation. Each archived row
+gets a narrow ArchivedRecord index entry so it can still be found by id
+or Chapa tx_ref. Review contributions stay in Listing.review_count and
+Listing.rating_sum, which archival never decrements.
+"""
+import contextvars
+import datetime
+import gzip
+import json
+import os
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedRecord, Booking, Payment, Review
+
+# Primary key field of each archived model in its values() dict
+ID_FIELDS = {'booking': 'booking_id', 'payment': 'id', 'review': 'review_id'}
+
+# Payments in these states can still change (e.g. a late webhook), so
+# their bookings stay in the hot tables
+OPEN_PAYMENT_STATUSES = ['PENDING']
+
+_archiving = contextvars.ContextVar('archiving', default=False)
+
+
+@contextmanager
+def archiving():
+    """Marks deletes as archival so signal handlers leave aggregates alone"""
+    token = _archiving.set(True)
+    try:
+        yield
+    finally:
+        _archiving.reset(token)
+
+
+def is_archiving():
+    return _archiving.get()
+
+
+# -------------------
+# Writing
+# -------------------
+def _write_segment(root, partition, lines):
+    """Write one compressed segment atomically; returns its path relative to root"""
+    relative = os.path.join(partition, f'segment-{uuid.uuid4().hex}.ndjson.gz')
+    path = os.path.join(root, relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as segment:
+            for line in lines:
+                segment.write(json.dumps(line, cls=DjangoJSONEncoder).encode('utf-8') + b'\n')
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp_path, path)
+    return relative
+
+
+def archivable(cutoff):
+    """
+    Bookings that can be archived at `cutoff` (a datetime): created and
+    checked out before it, with no open payment, and with their payment
+    and reviews untouched since. Pending reviews are kept as well, since
+    archiving them would drop their rating before it is ever counted.
+    """
+    return (
+        Booking.objects.filter(created_at__lt=cutoff, check_out__lt=cutoff.date())
+        .exclude(payment__status__in=OPEN_PAYMENT_STATUSES)
+        .exclude(payment__updated_at__gte=cutoff)
+        .exclude(reviews__created_at__gte=cutoff)
+        .exclude(reviews__moderation_status='pending')
+    )
+
+
+def _archive_batch(booking_ids, cutoff, root):
+    """Archive the given bookings; call with the booking rows locked"""
+    # Lock the children too, since their updates don't touch the booking
+    # row, then drop bookings a child change made unarchivable meanwhile
+    list(Payment.objects.select_for_update().filter(booking_id__in=booking_ids).values_list('pk'))
+    list(Review.objects.select_for_update().filter(booking_id__in=booking_ids).values_list('pk'))
+    booking_ids = list(archivable(cutoff).filter(pk__in=booking_ids).values_list('pk', flat=True))
+
+    bookings = list(Booking.objects.filter(pk__in=booking_ids).values())
+    payments = defaultdict(list)
+    for payment in Payment.objects.filter(booking_id__in=booking_ids).values():
+        payments[payment['booking_id']].append(payment)
+    reviews = defaultdict(list)
+    for review in Review.objects.filter(booking_id__in=booking_ids).values():
+        reviews[review['booking_id']].append(review)
+
+    # One segment per month partition in the batch
+    partitions = defaultdict(list)
+    for booking in bookings:
+        partitions[booking['created_at'].strftime('%Y/%m')].append(booking)
+
+    records = []
+    for partition, partition_bookings in partitions.items():
+        lines = []
+        for booking in partition_bookings:
+            lines.append({'model': 'booking', 'data': booking})
+            lines.extend({'model': 'payment', 'data': p} for p in payments[booking['booking_id']])
+            lines.extend({'model': 'review', 'data': r} for r in reviews[booking['booking_id']])
+        segment = _write_segment(root, partition, lines)
+
+        for line in lines:
+            data = line['data']
+            records.append(ArchivedRecord(
+                model_name=line['model'],
+                object_id=str(data[ID_FIELDS[line['model']]]),
+                chapa_tx_ref=data.get('chapa_tx_ref'),
+                segment=segment,
+                created_at=data['created_at'],
+            ))
+
+    ArchivedRecord.objects.bulk_create(records, ignore_conflicts=True)
+    Booking.objects.filter(pk__in=booking_ids).delete()
+
+    return {
+        'bookings': len(bookings),
+        'payments': sum(len(p) for p in payments.values()),
+        'reviews': sum(len(r) for r in reviews.values()),
+    }
+
+
+def archive_before(cutoff, batch_size=500, root=None):
+    """
+    Archive archivable() bookings at `cutoff` with their payments and
+    reviews. Returns counts per model.
+    """
+    root = root or settings.ARCHIVE_DIR
+    totals = defaultdict(int)
+    while True:
+        # Rows are read, written to the segment and deleted under one set of
+        # locks, so a concurrent change either lands first (and is archived
+        # or excludes the booking) or waits and finds the rows gone. A crash
+        # before commit leaves an unreferenced segment; the rows are still in
+        # the hot tables and get archived again on the next run.
+        with transaction.atomic(), archiving():
+            booking_ids = list(
+                archivable(cutoff)
+                .select_for_update(skip_locked=True, of=('self',))
+                .order_by('created_at')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not booking_ids:
+                break
+            counts = _archive_batch(booking_ids, cutoff, root)
+        for name, count in counts.items():
+            totals[name] += count
+    return dict(totals)
+
+
+def archive_old_records(horizon_days=None, batch_size=None):
+    horizon_days = horizon_days or settings.ARCHIVE_HORIZON_DAYS
+    cutoff = timezone.now() - datetime.timedelta(days=horizon_days)
+    return archive_before(cutoff, batch_size or settings.ARCHIVE_BATCH_SIZE)
+
+
+# -------------------
+# Lookup
+# -------------------
+def _read(record, root=None):
+    root = root or settings.ARCHIVE_DIR
+    id_field = ID_FIELDS[record.model_name]
+    with gzip.open(os.path.join(root, record.segment), 'rt', encoding='utf-8') as segment:
+        for line in segment:
+            entry = json.loads(line)
+            if entry['model'] == record.model_name and str(entry['data'][id_field]) == record.object_id:
+                return entry['data']
+    return None
+
+
+def find(model_name, object_id=None, chapa_tx_ref=None):
+    """Archived row as a dict (JSON-decoded values), or None"""
+    records = ArchivedRecord.objects.filter(model_name=model_name)
+    if object_id is not None:
+        records = records.filter(object_id=str(object_id))
+    elif chapa_tx_ref is not None:
+        records = records.filter(chapa_tx_ref=chapa_tx_ref)
+    else:
+        return None
+    record = records.first()
+    return _read(record) if record else None
+
+
+def find_booking(booking_id):
+    return find('booking', object_id=booking_id)
+
+
+def find_payment(payment_id=None, chapa_tx_ref=None):
+    return find('payment', object_id=payment_id, chapa_tx_ref=chapa_tx_ref)
+
+
+def find_review(review_id):
+    return find('review', object_id=review_id)
@@ -0,0 +1,220 @@
+# listings/bulk.py
+"""
+Bulk listing and booking import for channel-manager partners.
+
+Items are validated as a batch: field checks run in Python, one query
+resolves every referenced host/guest/listing, one query fetches the
+existing bookings that could overlap, and valid rows are written with
+bulk_create in chunks.
+
+Two modes:
+  atomic       any invalid item rejects the whole batch, nothing is written
+  best_effort  valid items are written, invalid ones are reported
+"""
+import bisect
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .models import Booking, Listing
+
+User = get_user_model()
+
+ATOMIC = 'atomic'
+BEST_EFFORT = 'best_effort'
+MODES = (ATOMIC, BEST_EFFORT)
+
+CHUNK_SIZE = 500
+
+LISTING_FIELDS = ('title', 'description', 'location', 'price_per_night')
+BOOKING_FIELDS = ('check_in', 'check_out', 'status')
+
+
+# -------------------
+# Helpers
+# -------------------
+def _clean_fields(model, item, field_names, defaults=None):
+    """Run each model field's own to_python/validators; returns (values, errors)"""
+    values, errors = {}, {}
+    for name in field_names:
+        field = model._meta.get_field(name)
+        raw = item.get(name, (defaults or {}).get(name))
+        try:
+            values[name] = field.clean(raw, None)
+        except ValidationError as e:
+            errors[name] = e.messages
+        except (TypeError, ValueError):
+            # e.g. a number or list where a date string is expected
+            errors[name] = [f'Invalid value for {name}: {raw!r}.']
+    return values, errors
+
+
+def _clean_pk(model, raw):
+    try:
+        return model._meta.pk.to_python(raw)
+    except (ValidationError, TypeError, ValueError):
+        return None
+
+
+def _existing_pks(model, pks):
+    """One query resolving which of the given primary keys exist"""
+    pks = {pk for pk in pks if pk is not None}
+    if not pks:
+        return set()
+    return set(model.objects.filter(pk__in=pks).values_list('pk', flat=True))
+
+
+def _insert(model, objects):
+    for start in range(0, len(objects), CHUNK_SIZE):
+        model.objects.bulk_create(objects[start:start + CHUNK_SIZE])
+
+
+def _finish(model, items, objects, errors, mode):
+    """Write the valid objects (unless atomic mode saw errors) and build per-item results"""
+    if errors and mode == ATOMIC:
+        objects = {}
+    else:
+        _insert(model, list(objects.values()))
+
+    results = []
+    for index in range(len(items)):
+        if index in objects:
+            results.append({'index': index, 'status': 'created', 'id': objects[index].pk})
+        elif index in errors:
+            results.append({'index': index, 'status': 'invalid', 'errors': errors[index]})
+        else:
+            results.append({'index': index, 'status': 'skipped'})
+    return results, list(objects.values())
+
+
+# -------------------
+# Listings
+# -------------------
+@transaction.atomic
+def import_listings(items, mode=ATOMIC):
+    """Validate and insert listing dicts; returns (per-item results, created objects)"""
+    cleaned, errors = {}, {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors[index] = {'non_field_errors': ['Expected an object.']}
+            continue
+        values, item_errors = _clean_fields(Listing, item, LISTING_FIELDS)
+        values['host_id'] = _clean_pk(User, item.get('host'))
+        if values['host_id'] is None:
+            item_errors['host'] = ['A valid host id is required.']
+        if item_errors:
+            errors[index] = item_errors
+        else:
+            cleaned[index] = values
+
+    hosts = _existing_pks(User, (v['host_id'] for v in cleaned.values()))
+    objects = {}
+    for index, values in cleaned.items():
+        if values['host_id'] not in hosts:
+            errors[index] = {'host': [f"Host {values['host_id']} does not exist."]}
+        else:
+            objects[index] = Listing(**values)
+
+    return _finish(Listing, items, objects, errors, mode)
+
+
+# -------------------
+# Bookings
+# -------------------
+def _merge(intervals):
+    """Union of [check_in, check_out) intervals as sorted, non-overlapping lists"""
+    starts, ends = [], []
+    for start, end in sorted(intervals):
+        if ends and start < ends[-1]:
+            ends[-1] = max(ends[-1], end)
+        else:
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+
+def _overlaps(starts, ends, check_in, check_out):
+    i = bisect.bisect_left(starts, check_out)
+    return i > 0 and ends[i - 1] > check_in
+
+
+@transaction.atomic
+def import_bookings(items, mode=ATOMIC):
+    """Validate and insert booking dicts; returns (per-item results, created objects)"""
+    cleaned, errors = {}, {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors[index] = {'non_field_errors': ['Expected an object.']}
+            continue
+        values, item_errors = _clean_fields(
+            Booking, item, BOOKING_FIELDS, defaults={'status': 'pending'}
+        )
+        values['listing_id'] = _clean_pk(Listing, item.get('listing'))
+        values['guest_id'] = _clean_pk(User, item.get('guest'))
+        if values['listing_id'] is None:
+            item_errors['listing'] = ['A valid listing id is required.']
+        if values['guest_id'] is None:
+            item_errors['guest'] = ['A valid guest id is required.']
+        if not item_errors and values['check_out'] <= values['check_in']:
+            item_errors['check_out'] = ['Check-out must be after check-in.']
+        if item_errors:
+            errors[index] = item_errors
+        else:
+            cleaned[index] = values
+
+    # Lock the listings so concurrent imports can't double-book them
+    listing_ids = {v['listing_id'] for v in cleaned.values()}
+    listings = set(
+        Listing.objects.select_for_update().filter(pk__in=listing_ids).values_list('pk', flat=True)
+    ) if listing_ids else set()
+    guests = _existing_pks(User, (v['guest_id'] for v in cleaned.values()))
+
+    # Existing bookings that could overlap anything in the batch, grouped per listing
+    occupied = defaultdict(list)
+    active = [v for v in cleaned.values() if v['status'] != 'canceled']
+    if active:
+        existing = (
+            Booking.objects.filter(
+                listing_id__in=listings,
+                check_in__lt=max(v['check_out'] for v in active),
+                check_out__gt=min(v['check_in'] for v in active),
+            )
+            .exclude(status='canceled')
+            .values_list('listing_id', 'check_in', 'check_out')
+        )
+        for listing_id, check_in, check_out in existing:
+            occupied[listing_id].append((check_in, check_out))
+    calendars = {listing_id: _merge(occupied[listing_id]) for listing_id in listings}
+
+    objects = {}
+    for index, values in cleaned.items():
+        if values['listing_id'] not in listings:
+            errors[index] = {'listing': [f"Listing {values['listing_id']} does not exist."]}
+            continue
+        if values['guest_id'] not in guests:
+            errors[index] = {'guest': [f"Guest {values['guest_id']} does not exist."]}
+            continue
+        if values['status'] != 'canceled':
+            starts, ends = calendars[values['listing_id']]
+            if _overlaps(starts, ends, values['check_in'], values['check_out']):
+                errors[index] = {'non_field_errors': ['Listing is already booked for these dates.']}
+                continue
+            # Later items in the same batch must not overlap this one either
+            position = bisect.bisect_left(starts, values['check_in'])
+            starts.insert(position, values['check_in'])
+            ends.insert(position, values['check_out'])
+        objects[index] = Booking(**values)
+
+    results, created = _finish(Booking, items, objects, errors, mode)
+    # bulk_create skips post_save, so refresh the occupancy bitmaps and
+    # booking summaries here
+    from . import occupancy, summaries
+
+    touched = {booking.listing_id for booking in created}
+    if touched:
+        booking_ids = [booking.pk for booking in created]
+        transaction.on_commit(lambda: occupancy.rebuild(touched))
+        transaction.on_commit(lambda: summaries.sync_bookings(booking_ids))
+    return results, created
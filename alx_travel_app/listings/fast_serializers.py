@@ -0,0 +1,247 @@
+# listings/fast_serializers.py
+"""
+Fast read path for the list endpoints.
+
+compile_serializer() walks a DRF serializer's fields once and turns them
+into a flat list of ORM value paths plus one converter per field. list
+actions can then fetch plain tuples with .values_list() and build the
+response dicts directly, skipping model instantiation and the per-field
+get_attribute/to_representation machinery. Converters reproduce what the
+DRF fields return, so the rendered JSON is byte-identical to the
+serializer output.
+
+Serializers using fields the compiler doesn't know (method fields, source='*',
+nullable nested relations, ...) compile to None and keep the DRF path.
+"""
+import decimal
+from functools import lru_cache
+
+from django.conf import settings
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+
+class Unsupported(Exception):
+    pass
+
+
+# -------------------
+# Converters
+# -------------------
+# Each DRF field compiles to a "prepare" callable that returns the
+# per-value converter. It runs once per encode() call, so things that can
+# change per request (the active timezone) are resolved once, not per row.
+def _static(convert):
+    return lambda: convert
+
+
+def _nullable(convert):
+    # DRF renders None attributes as None without calling the field
+    return lambda value: None if value is None else convert(value)
+
+
+def _identity(value):
+    return value
+
+
+def _str(value):
+    return None if value is None else str(value)
+
+
+def _int(value):
+    return None if value is None else int(value)
+
+
+def _date(value):
+    return value.isoformat() if value else None
+
+
+def _decimal_converter(field):
+    if field.localize or field.normalize_output or field.decimal_places is None:
+        return _static(_nullable(field.to_representation))
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value):
+        if value is None:
+            return None
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        quantized = value.quantize(exponent, rounding=rounding, context=context)
+        return f'{quantized:f}' if coerce_to_string else quantized
+
+    return _static(convert)
+
+
+def _datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return _static(_nullable(field.to_representation))
+
+    def prepare():
+        field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        if field_timezone is None:
+            return _nullable(field.to_representation)
+
+        def convert(value):
+            if not value:
+                return None
+            if value.utcoffset() is None:
+                # Naive values need DRF's make_aware handling
+                return field.to_representation(value)
+            value = value.astimezone(field_timezone).isoformat()
+            if value.endswith('+00:00'):
+                value = value[:-6] + 'Z'
+            return value
+
+        return convert
+
+    return prepare
+
+
+def _choice_converter(field):
+    choices = field.choice_strings_to_values
+
+    def convert(value):
+        if value in ('', None):
+            return value
+        return choices.get(str(value), value)
+
+    return _static(convert)
+
+
+def _converter(field):
+    # Order matters: several DRF fields subclass each other
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        if field.pk_field is not None:
+            return _static(_nullable(field.pk_field.to_representation))
+        return _static(_identity)
+    if isinstance(field, serializers.ReadOnlyField):
+        return _static(_identity)
+    if isinstance(field, serializers.UUIDField):
+        if field.uuid_format != 'hex_verbose':
+            return _static(_nullable(field.to_representation))
+        return _static(_str)
+    if isinstance(field, serializers.DecimalField):
+        return _decimal_converter(field)
+    if isinstance(field, serializers.DateTimeField):
+        return _datetime_converter(field)
+    if isinstance(field, serializers.DateField):
+        output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+        if output_format is None or output_format.lower() != ISO_8601:
+            return _static(_nullable(field.to_representation))
+        return _static(_date)
+    if isinstance(field, serializers.ChoiceField):
+        return _choice_converter(field)
+    if isinstance(field, serializers.IntegerField):
+        return _static(_int)
+    if isinstance(field, serializers.CharField):
+        return _static(_str)
+    if isinstance(field, (serializers.BooleanField, serializers.FloatField, serializers.JSONField)):
+        return _static(_nullable(field.to_representation))
+    raise Unsupported(f'{type(field).__name__} is not supported')
+
+
+# -------------------
+# Compiling
+# -------------------
+class FastEncoder:
+    """
+    Flat value paths plus a generated function that rebuilds the nested
+    dicts from one values_list() tuple per row.
+    """
+
+    def __init__(self, paths, converters, layout):
+        self.paths = paths
+        self.converters = converters
+        self._encode = self._generate(layout)
+
+    @staticmethod
+    def _generate(layout):
+        def expression(layout):
+            items = []
+            for name, part in layout:
+                value = expression(part) if isinstance(part, list) else f'c{part}(row[{part}])'
+                items.append(f'{name!r}: {value}')
+            return '{' + ', '.join(items) + '}'
+
+        indexes = []
+
+        def collect(layout):
+            for _, part in layout:
+                collect(part) if isinstance(part, list) else indexes.append(part)
+
+        collect(layout)
+        unpack = ''.join(f'    c{i} = converters[{i}]\n' for i in indexes)
+        source = (
+            'def encode(rows, converters):\n'
+            f'{unpack}'
+            f'    return [{expression(layout)} for row in rows]\n'
+        )
+        namespace = {}
+        exec(compile(source, '<fast_serializers>', 'exec'), namespace)
+        return namespace['encode']
+
+    def encode(self, rows):
+        return self._encode(rows, [prepare() for prepare in self.converters])
+
+
+def _compile(serializer, prefix, model, paths, converters):
+    layout = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if field.source == '*' or isinstance(field, serializers.SerializerMethodField):
+            raise Unsupported(f'{name}: source="*" and method fields are not supported')
+        if isinstance(field, serializers.ListSerializer):
+            raise Unsupported(f'{name}: to-many nested serializers are not supported')
+        if isinstance(field, serializers.BaseSerializer):
+            related = model._meta.get_field(field.source_attrs[0])
+            if len(field.source_attrs) != 1 or related.null:
+                raise Unsupported(f'{name}: only non-null direct relations can be nested')
+            layout.append((name, _compile(
+                field, prefix + field.source_attrs, related.related_model, paths, converters
+            )))
+            continue
+
+        paths.append('__'.join(prefix + field.source_attrs))
+        converters.append(_converter(field))
+        layout.append((name, len(paths) - 1))
+    return layout
+
+
+@lru_cache(maxsize=None)
+def compile_serializer(serializer_class):
+    """FastEncoder for a ModelSerializer class, or None if it needs the DRF path"""
+    try:
+        serializer = serializer_class()
+        paths, converters = [], []
+        layout = _compile(serializer, [], serializer_class.Meta.model, paths, converters)
+    except Unsupported:
+        return None
+    return FastEncoder(paths, converters, layout)
+
+
+class FastListMixin:
+    """
+    Opt-in fast `list` for ModelViewSets (settings.FAST_LIST_SERIALIZATION).
+    Falls back to the regular DRF path when the serializer can't be compiled.
+    """
+
+    def list(self, request, *args, **kwargs):
+        encoder = None
+        if settings.FAST_LIST_SERIALIZATION:
+            encoder = compile_serializer(self.get_serializer_class())
+        if encoder is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset()).values_list(*encoder.paths)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(encoder.encode(page))
+        return Response(encoder.encode(queryset))
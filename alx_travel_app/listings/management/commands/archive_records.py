@@ -0,0 +1,32 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from listings.archive import archivable, archive_before
+
+
+class Command(BaseCommand):
+    help = 'Move bookings (with their payments and reviews) older than the horizon to archive segments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ARCHIVE_HORIZON_DAYS,
+                            help='Archive bookings created and checked out more than this many days ago')
+        parser.add_argument('--batch-size', type=int, default=settings.ARCHIVE_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report how many bookings would be archived')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(days=options['days'])
+
+        if options['dry_run']:
+            count = archivable(cutoff).count()
+            self.stdout.write(f'{count} bookings older than {cutoff:%Y-%m-%d} would be archived')
+            return
+
+        totals = archive_before(cutoff, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {totals.get('bookings', 0)} bookings, {totals.get('payments', 0)} payments "
+            f"and {totals.get('reviews', 0)} reviews older than {cutoff:%Y-%m-%d}"
+        ))
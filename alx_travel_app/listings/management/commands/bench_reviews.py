@@ -0,0 +1,159 @@
+import datetime
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import F
+
+from listings.models import Booking, Listing, Review
+from listings.moderation import get_moderator, moderate_batch
+from listings.serializers import ReviewSerializer
+
+User = get_user_model()
+
+COMMENTS = [
+    'Great stay, the host was very welcoming and the flat was spotless.',
+    'Nice location close to everything, a bit noisy at night.',
+    'Would book again! Check-in was quick and easy.',
+    'Cheap rooms here: www.example.com/deal www.example.com/more',
+    'TERRIBLE PLACE NEVER AGAIN DO NOT BOOK THIS LISTING',
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+class QueryCounter:
+    """connection.execute_wrapper() hook counting statements"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return self.count
+
+
+class Command(BaseCommand):
+    help = (
+        'Simulate a burst of reviews after a peak checkout day: ingestion rate through '
+        'ReviewSerializer, then batched moderation vs per-review aggregate updates '
+        '(sample rows are rolled back)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reviews', type=int, default=5000)
+        parser.add_argument('--listings', type=int, default=50,
+                            help='Listings the burst is spread over (fewer = hotter rows)')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        if options['reviews'] < 1 or options['listings'] < 1:
+            raise CommandError('--reviews and --listings must be positive')
+        try:
+            with transaction.atomic():
+                bookings = self.seed(options['reviews'], options['listings'])
+                self.ingest(bookings)
+                self.compare(options['batch_size'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, reviews, listings):
+        host, _ = User.objects.get_or_create(username='bench-host')
+        guest, _ = User.objects.get_or_create(username='bench-guest')
+        listing_objects = Listing.objects.bulk_create([
+            Listing(title=f'Bench listing {i}', description='Bench description',
+                    location='Addis Ababa', price_per_night='100.00', host=host)
+            for i in range(listings)
+        ])
+        check_out = datetime.date.today() - datetime.timedelta(days=1)
+        return Booking.objects.bulk_create([
+            Booking(listing=listing_objects[i % listings], guest=guest,
+                    check_in=check_out - datetime.timedelta(days=2), check_out=check_out,
+                    status='confirmed')
+            for i in range(reviews)
+        ])
+
+    def ingest(self, bookings):
+        rng = random.Random(0)
+        started = time.perf_counter()
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            for booking in bookings:
+                serializer = ReviewSerializer(data={
+                    'booking_id': str(booking.pk),
+                    'rating': rng.randint(1, 5),
+                    'comment': rng.choice(COMMENTS),
+                })
+                serializer.is_valid(raise_exception=True)
+                serializer.save()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'ingest: {len(bookings)} reviews in {elapsed:.2f}s '
+            f'({len(bookings) / elapsed:,.0f} reviews/s, '
+            f'{len(queries) / len(bookings):.1f} queries/review, no listing writes)'
+        )
+
+    def compare(self, batch_size):
+        pending = list(
+            Review.objects.filter(moderation_status='pending')
+            .values_list('pk', 'comment', 'rating', 'booking_id')
+        )
+        moderator = get_moderator()
+
+        # Baseline: classify and update the listing row once per review, as
+        # a synchronous per-write handler would
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                queries = QueryCounter()
+                with connection.execute_wrapper(queries):
+                    for pk, comment, rating, booking_id in pending:
+                        approved, reason = moderator.classify(comment)
+                        Review.objects.filter(pk=pk).update(
+                            moderation_status='approved' if approved else 'rejected',
+                            moderation_reason=reason,
+                            counted_rating=rating if approved else None,
+                        )
+                        if approved:
+                            Listing.objects.filter(bookings__pk=booking_id).update(
+                                review_count=F('review_count') + 1,
+                                rating_sum=F('rating_sum') + rating,
+                            )
+                baseline = time.perf_counter() - started, len(queries), self.aggregates()
+                raise Rollback
+        except Rollback:
+            pass
+
+        started = time.perf_counter()
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            batches = 0
+            while moderate_batch(batch_size, moderator) is not None:
+                batches += 1
+        batched = time.perf_counter() - started, len(queries), self.aggregates()
+
+        if baseline[2] != batched[2]:
+            raise CommandError('Batched aggregates differ from the per-review baseline')
+        for name, (elapsed, query_count, _) in (('per-review', baseline), ('batched', batched)):
+            self.stdout.write(
+                f'{name}: {len(pending) / elapsed:,.0f} reviews/s, {query_count} queries'
+            )
+        self.stdout.write(
+            f'batched: {batches} batches of up to {batch_size}, '
+            f'{baseline[0] / batched[0]:.1f}x faster, aggregates identical'
+        )
+
+    @staticmethod
+    def aggregates():
+        return sorted(
+            Listing.objects.filter(title__startswith='Bench listing')
+            .values_list('title', 'review_count', 'rating_sum')
+        )
@@ -0,0 +1,90 @@
+import datetime
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from listings.fast_serializers import compile_serializer
+from listings.models import Booking, Listing, Review
+from listings.serializers import BookingSerializer, ListingSerializer, ReviewSerializer
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare rows/sec of the DRF serializers and the fast list path (sample rows are rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.seed(options['rows'])
+                for model, serializer_class in (
+                    (Listing, ListingSerializer),
+                    (Booking, BookingSerializer),
+                    (Review, ReviewSerializer),
+                ):
+                    self.compare(model, serializer_class, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, rows):
+        host, _ = User.objects.get_or_create(username='bench-host')
+        listings = Listing.objects.bulk_create([
+            Listing(title=f'Bench listing {i}', description='Bench description ' * 5,
+                    location='Addis Ababa', price_per_night='123.45', host=host)
+            for i in range(rows)
+        ])
+        start = datetime.date(2020, 1, 1)
+        bookings = Booking.objects.bulk_create([
+            Booking(listing=listing, guest=host, check_in=start,
+                    check_out=start + datetime.timedelta(days=2), status='confirmed')
+            for listing in listings
+        ])
+        Review.objects.bulk_create([
+            Review(booking=booking, rating=5, comment='Great stay!') for booking in bookings
+        ])
+
+    def compare(self, model, serializer_class, repeat):
+        encoder = compile_serializer(serializer_class)
+        if encoder is None:
+            raise CommandError(f'{serializer_class.__name__} cannot use the fast path')
+        renderer = JSONRenderer()
+        # Give the DRF path its best case: no N+1 queries for the nested serializers
+        relations = {path.rsplit('__', 1)[0] for path in encoder.paths if '__' in path}
+        queryset = model.objects.select_related(*relations)
+        rows = queryset.count()
+
+        def drf():
+            return renderer.render(serializer_class(queryset.all(), many=True).data)
+
+        def fast():
+            return renderer.render(encoder.encode(queryset.values_list(*encoder.paths)))
+
+        if drf() != fast():
+            raise CommandError(f'{serializer_class.__name__}: fast output differs from DRF output')
+
+        timings = {}
+        for name, func in (('drf', drf), ('fast', fast)):
+            best = float('inf')
+            for _ in range(repeat):
+                started = time.perf_counter()
+                func()
+                best = min(best, time.perf_counter() - started)
+            timings[name] = rows / best
+
+        self.stdout.write(
+            f"{serializer_class.__name__}: {rows} rows, "
+            f"drf {timings['drf']:,.0f} rows/s, fast {timings['fast']:,.0f} rows/s "
+            f"({timings['fast'] / timings['drf']:.1f}x), output identical"
+        )
@@ -0,0 +1,97 @@
+import logging
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from listings.middleware import AdaptiveLimit, ConcurrencyLimitMiddleware
+
+
+class StubMiddleware(ConcurrencyLimitMiddleware):
+    """Routes by path instead of the URLconf so the test needs no database or gateway"""
+
+    def __init__(self, get_response, pool):
+        self.get_response = get_response
+        self.pool = pool
+
+    def pool_for(self, request):
+        if self.pool is not None and request.path.startswith('/gateway/'):
+            return self.pool
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Load test a worker with a slow stub gateway and report read latency '
+            'with and without the gateway bulkhead')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='Worker threads')
+        parser.add_argument('--duration', type=float, default=5.0)
+        parser.add_argument('--gateway-latency', type=float, default=2.0)
+        parser.add_argument('--gateway-rps', type=float, default=20.0)
+        parser.add_argument('--read-rps', type=float, default=100.0)
+
+    def handle(self, *args, **options):
+        logging.getLogger('listings.middleware').setLevel(logging.WARNING)
+        for label, pool in (
+            ('no limiter', None),
+            ('bulkhead', AdaptiveLimit('gateway', initial_limit=4, max_limit=8, queue_timeout=0.05,
+                                       target_latency=options['gateway_latency'] * 2)),
+        ):
+            stats = self.run(pool, options)
+            reads = sorted(stats['read'])
+            self.stdout.write(
+                f"{label:<11} reads: n={len(reads)} "
+                f"p50={statistics.median(reads) * 1000:.1f}ms "
+                f"p99={reads[int(len(reads) * 0.99) - 1] * 1000:.1f}ms | "
+                f"gateway: ok={stats['gateway_ok']} shed={stats['gateway_shed']}"
+            )
+
+    def run(self, pool, options):
+        gateway_latency = options['gateway_latency']
+
+        def view(request):
+            if request.path.startswith('/gateway/'):
+                time.sleep(gateway_latency)
+            else:
+                time.sleep(0.001)
+            return HttpResponse('ok')
+
+        middleware = StubMiddleware(view, pool)
+        factory = RequestFactory()
+        stats = {'read': [], 'gateway_ok': 0, 'gateway_shed': 0}
+        lock = threading.Lock()
+
+        def handle(path, submitted):
+            response = middleware(factory.get(path))
+            elapsed = time.monotonic() - submitted
+            with lock:
+                if path.startswith('/gateway/'):
+                    stats['gateway_ok' if response.status_code == 200 else 'gateway_shed'] += 1
+                else:
+                    stats['read'].append(elapsed)
+
+        # The executor plays the worker's thread pool: requests queue for a free thread
+        with ThreadPoolExecutor(max_workers=options['threads']) as workers:
+            def generate(path, rps):
+                interval = 1.0 / rps
+                end = time.monotonic() + options['duration']
+                next_at = time.monotonic()
+                while next_at < end:
+                    time.sleep(max(0.0, next_at - time.monotonic()))
+                    workers.submit(handle, path, time.monotonic())
+                    next_at += interval
+
+            generators = [
+                threading.Thread(target=generate, args=('/gateway/initiate-payment/', options['gateway_rps'])),
+                threading.Thread(target=generate, args=('/api/listings/', options['read_rps'])),
+            ]
+            for thread in generators:
+                thread.start()
+            for thread in generators:
+                thread.join()
+        return stats
@@ -0,0 +1,136 @@
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Modules that should only be imported when a request or task needs them.
+# DRF's compat module imports requests whenever it is installed, so the
+# HTTP client can only be kept off the worker boot path, and only while
+# CELERY_SKIP_CHECKS is set (see alx_travel_app/celery.py): Celery's
+# Django fixup otherwise runs system checks, which import the URLconf.
+LAZY_MODULES = {
+    'setup': ('numpy', 'scipy', 'drf_yasg', 'rest_framework.test'),
+    'web': ('numpy', 'scipy', 'drf_yasg', 'rest_framework.test'),
+    'worker': ('numpy', 'scipy', 'drf_yasg', 'rest_framework.views', 'requests'),
+}
+
+# Runs in a fresh interpreter under -X importtime; times each app's module
+# import, models import and ready() during django.setup()
+CHILD_SCRIPT = r'''
+import json, sys, time
+started = time.perf_counter()
+from django.apps.config import AppConfig
+
+timings = {}
+_create = AppConfig.create.__func__
+
+def timed(label, phase, func):
+    def wrapper(*args, **kwargs):
+        begin = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timings.setdefault(label, {})[phase] = time.perf_counter() - begin
+    return wrapper
+
+def create(cls, entry):
+    begin = time.perf_counter()
+    config = _create(cls, entry)
+    timings.setdefault(config.label, {})['create'] = time.perf_counter() - begin
+    config.import_models = timed(config.label, 'models', config.import_models)
+    config.ready = timed(config.label, 'ready', config.ready)
+    return config
+
+AppConfig.create = classmethod(create)
+
+import django
+from django.conf import settings
+django.setup()
+setup_done = time.perf_counter()
+
+target = sys.argv[1]
+if target == 'web':
+    __import__(settings.ROOT_URLCONF)
+elif target == 'worker':
+    from celery import current_app
+    current_app.loader.import_default_modules()
+
+print(json.dumps({
+    'apps': timings,
+    'modules': sorted(sys.modules),
+    'setup': setup_done - started,
+    'total': time.perf_counter() - started,
+}))
+'''
+
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$')
+
+
+class Command(BaseCommand):
+    help = 'Profile interpreter imports and django.setup() cost for a web or Celery worker boot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', choices=['setup', 'web', 'worker'], default='web',
+                            help='setup: django.setup() only; web: plus the URLconf; '
+                                 'worker: plus Celery task modules')
+        parser.add_argument('--top', type=int, default=15)
+        parser.add_argument('--max-seconds', type=float,
+                            help='Fail if the boot takes longer than this')
+        parser.add_argument('--check-lazy', action='store_true',
+                            help='Fail if a module in LAZY_MODULES for the target is imported at boot')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', CHILD_SCRIPT, options['target']],
+            capture_output=True, text=True, env=env,
+        )
+        if result.returncode != 0:
+            output = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+            raise CommandError('Boot failed:\n' + '\n'.join(output[-20:]))
+
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        # -X importtime misses modules loaded via importlib.import_module
+        # (how Django loads apps), so the child reports sys.modules too
+        imported = set(report['modules'])
+        packages = self.parse_importtime(result.stderr)
+
+        self.stdout.write(f"Boot target: {options['target']}")
+        self.stdout.write(f"django.setup(): {report['setup'] * 1000:.1f} ms, "
+                          f"total: {report['total'] * 1000:.1f} ms\n")
+
+        self.stdout.write('Per app (ms)        create   models    ready')
+        for label, phases in report['apps'].items():
+            self.stdout.write(
+                f"  {label:<18}" + ''.join(
+                    f"{phases.get(phase, 0) * 1000:>9.1f}" for phase in ('create', 'models', 'ready')
+                )
+            )
+
+        self.stdout.write(f"\nTop {options['top']} packages by import time (self, ms)")
+        for package, micros in sorted(packages.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f'  {package:<30}{micros / 1000:>9.1f}')
+
+        errors = []
+        if options['check_lazy']:
+            eager = [m for m in LAZY_MODULES[options['target']] if m in imported]
+            if eager:
+                errors.append(f"Imported at boot: {', '.join(eager)}")
+        if options['max_seconds'] is not None and report['total'] > options['max_seconds']:
+            errors.append(f"Boot took {report['total']:.2f}s, limit is {options['max_seconds']:.2f}s")
+        if errors:
+            raise CommandError('; '.join(errors))
+
+    def parse_importtime(self, stderr):
+        """Self import time (us) per top-level package"""
+        packages = defaultdict(int)
+        for line in stderr.splitlines():
+            match = IMPORTTIME_RE.match(line)
+            if match:
+                self_us, _, _, module = match.groups()
+                packages[module.split('.')[0]] += int(self_us)
+        return packages
@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from listings.outbox import outbox_lag, relay_outbox, retry_dead_events
+
+
+class Command(BaseCommand):
+    help = 'Publish pending outbox events to Celery'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.OUTBOX_BATCH_SIZE)
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds to sleep when the outbox is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the outbox once and exit')
+        parser.add_argument('--stats', action='store_true',
+                            help='Print outbox lag and exit')
+        parser.add_argument('--retry-dead', action='store_true',
+                            help='Put dead-lettered events back in the queue and exit')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            lag = outbox_lag()
+            self.stdout.write(
+                f"pending={lag['pending']} dead={lag['dead']} "
+                f"oldest_age_seconds={lag['oldest_age_seconds']:.3f}"
+            )
+            return
+        if options['retry_dead']:
+            self.stdout.write(f'Requeued {retry_dead_events()} dead-lettered events')
+            return
+
+        while True:
+            published = relay_outbox(batch_size=options['batch_size'])
+            if published:
+                self.stdout.write(f'Published {published} events')
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,138 @@
+# listings/middleware.py
+"""
+Concurrency limits for endpoints that wait on the payment gateway.
+
+Views mapped to a pool in settings.CONCURRENCY_POOL_ROUTES (by URL name)
+run inside a bounded bulkhead. When the pool is full, a request waits at
+most `queue_timeout` seconds for a slot and is then shed with
+503 + Retry-After, so slow Chapa calls can't tie up every worker thread
+and starve cheap read endpoints. Pool sizes adapt AIMD-style: +1/limit
+per fast response, halved when a response is slow or a gateway error -
+at most once per congestion window, i.e. only by requests that started
+after the previous decrease.
+
+Limits are per process. Size them below the worker's thread count
+(e.g. gunicorn --threads) so reads always keep some threads.
+"""
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+GATEWAY_ERROR_STATUSES = {502, 503, 504}
+
+
+class AdaptiveLimit:
+    """Bulkhead whose size follows observed latency (additive increase, multiplicative decrease)"""
+
+    def __init__(self, name, initial_limit=4, min_limit=1, max_limit=16,
+                 queue_timeout=1.0, max_queue=8, target_latency=2.0, backoff=0.5):
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+        self.target_latency = target_latency
+        self.backoff = backoff
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.shed = 0
+        self._last_decrease = float('-inf')
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Take a slot, waiting up to queue_timeout; False means the request should be shed"""
+        with self._condition:
+            if self.in_flight >= int(self.limit) and self.waiting >= self.max_queue:
+                self.shed += 1
+                return False
+            deadline = time.monotonic() + self.queue_timeout
+            self.waiting += 1
+            try:
+                while self.in_flight >= int(self.limit):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.shed += 1
+                        return False
+                    self._condition.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+            return True
+
+    def release(self, started, failed=False):
+        """Free the slot of a request that started at `started` (time.monotonic())"""
+        now = time.monotonic()
+        with self._condition:
+            self.in_flight -= 1
+            if failed or now - started > self.target_latency:
+                # Back off once per congestion window: requests already in
+                # flight at the last decrease don't halve the limit again
+                if started > self._last_decrease:
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._condition.notify()
+
+    @property
+    def retry_after(self):
+        return max(1, math.ceil(self.target_latency))
+
+    def snapshot(self):
+        with self._condition:
+            return {
+                'limit': round(self.limit, 2),
+                'in_flight': self.in_flight,
+                'waiting': self.waiting,
+                'shed': self.shed,
+            }
+
+
+class ConcurrencyLimitMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.pools = {
+            name: AdaptiveLimit(name, **config)
+            for name, config in getattr(settings, 'CONCURRENCY_POOLS', {}).items()
+        }
+        self.routes = getattr(settings, 'CONCURRENCY_POOL_ROUTES', {})
+
+    def pool_for(self, request):
+        if not self.routes:
+            return None
+        try:
+            url_name = resolve(request.path_info).url_name
+        except Resolver404:
+            return None
+        return self.pools.get(self.routes.get(url_name))
+
+    def __call__(self, request):
+        pool = self.pool_for(request)
+        if pool is None:
+            return self.get_response(request)
+
+        if not pool.acquire():
+            logger.info('Shedding %s: %s pool is full (%s)', request.path, pool.name, pool.snapshot())
+            response = JsonResponse(
+                {'error': 'Payment service is busy, please retry shortly'}, status=503
+            )
+            response['Retry-After'] = str(pool.retry_after)
+            return response
+
+        started = time.monotonic()
+        failed = True
+        try:
+            response = self.get_response(request)
+            failed = response.status_code in GATEWAY_ERROR_STATUSES
+            return response
+        finally:
+            pool.release(started, failed)
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0002_payment_outboxevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingOccupancy',
+            fields=[
+                ('listing', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='occupancy', serialize=False, to='listings.listing')),
+                ('window_start', models.DateField()),
+                ('bits', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:59
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_review_aggregates(apps, schema_editor):
+    Listing = apps.get_model('listings', 'Listing')
+    Review = apps.get_model('listings', 'Review')
+    totals = (
+        Review.objects.values('booking__listing_id')
+        .annotate(count=Count('pk'), total=Sum('rating'))
+    )
+    for row in totals:
+        Listing.objects.filter(pk=row['booking__listing_id']).update(
+            review_count=row['count'], rating_sum=row['total'] or 0
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0003_listingoccupancy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='ArchivedRecord',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(choices=[('booking', 'Booking'), ('payment', 'Payment'), ('review', 'Review')], max_length=20)),
+                ('object_id', models.CharField(max_length=64)),
+                ('chapa_tx_ref', models.CharField(blank=True, db_index=True, max_length=100, null=True)),
+                ('segment', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('model_name', 'object_id'), name='unique_archived_record')],
+            },
+        ),
+        migrations.RunPython(backfill_review_aggregates, migrations.RunPython.noop),
+    ]
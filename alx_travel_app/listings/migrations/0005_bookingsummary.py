@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_booking_summaries(apps, schema_editor):
+    Booking = apps.get_model('listings', 'Booking')
+    BookingSummary = apps.get_model('listings', 'BookingSummary')
+    Payment = apps.get_model('listings', 'Payment')
+    payments = {
+        p['booking_id']: p
+        for p in Payment.objects.values('booking_id', 'status', 'amount', 'currency')
+    }
+    summaries = []
+    for booking in Booking.objects.select_related('listing').iterator(chunk_size=2000):
+        payment = payments.get(booking.pk, {})
+        summaries.append(BookingSummary(
+            booking_id=booking.pk,
+            guest_id=booking.guest_id,
+            listing_id=booking.listing_id,
+            listing_title=booking.listing.title,
+            check_in=booking.check_in,
+            check_out=booking.check_out,
+            booking_status=booking.status,
+            payment_status=payment.get('status', ''),
+            amount=payment.get('amount'),
+            currency=payment.get('currency', ''),
+            created_at=booking.created_at,
+        ))
+    BookingSummary.objects.bulk_create(summaries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0004_review_aggregates_archivedrecord'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingSummary',
+            fields=[
+                ('booking', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='listings.booking')),
+                ('listing_title', models.CharField(max_length=255)),
+                ('check_in', models.DateField()),
+                ('check_out', models.DateField()),
+                ('booking_status', models.CharField(max_length=20)),
+                ('payment_status', models.CharField(blank=True, max_length=20)),
+                ('amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('currency', models.CharField(blank=True, max_length=3)),
+                ('created_at', models.DateTimeField()),
+                ('guest', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booking_summaries', to=settings.AUTH_USER_MODEL)),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='listings.listing')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['guest', '-created_at'], name='listings_bo_guest_i_75c311_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_booking_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:05
+
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import F
+
+
+def approve_existing_reviews(apps, schema_editor):
+    # 0004 already counted every existing review in the listing aggregates
+    Review = apps.get_model('listings', 'Review')
+    Review.objects.update(moderation_status='approved', counted_rating=F('rating'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0005_bookingsummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='counted_rating',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='moderated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='moderation_reason',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='moderation_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected')], default='pending', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='review',
+            name='rating',
+            field=models.IntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(5)]),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['moderation_status', 'created_at'], name='listings_re_moderat_66a57c_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='review',
+            constraint=models.UniqueConstraint(fields=('booking',), name='unique_review_per_booking'),
+        ),
+        migrations.RunPython(approve_existing_reviews, migrations.RunPython.noop),
+    ]
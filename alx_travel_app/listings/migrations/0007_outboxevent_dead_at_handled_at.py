@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0006_review_moderation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxevent',
+            name='dead_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='outboxevent',
+            name='handled_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,10 +1,15 @@
-from datetime import timezone
 import uuid
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.dispatch import Signal
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
+# Sent after Payment.transition_to() wins; the UPDATE bypasses post_save
+payment_status_changed = Signal()
+
 class Listing(models.Model):
     listing_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     title = models.CharField(max_length=255)
@@ -14,9 +19,17 @@ class Listing(models.Model):
     host = models.ForeignKey(User, on_delete=models.CASCADE, related_name='listings')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Review aggregates, kept intact when old reviews are archived
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+
     def __str__(self):
         return self.title
 
+    @property
+    def average_rating(self):
+        return self.rating_sum / self.review_count if self.review_count else None
+
 class Booking(models.Model):
     booking_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='bookings')
@@ -30,11 +43,35 @@ class Booking(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
 class Review(models.Model):
+    MODERATION_STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('approved', 'Approved'),
+        ('rejected', 'Rejected'),
+    ]
+
     review_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='reviews')
-    rating = models.IntegerField()
+    rating = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
     comment = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+
+    # Set by the moderation batches (listings/moderation.py)
+    moderation_status = models.CharField(
+        max_length=20, choices=MODERATION_STATUS_CHOICES, default='pending'
+    )
+    moderation_reason = models.CharField(max_length=100, blank=True)
+    moderated_at = models.DateTimeField(null=True, blank=True)
+    # Rating currently included in the listing's review_count/rating_sum
+    # (None while pending or rejected)
+    counted_rating = models.IntegerField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [models.Index(fields=['moderation_status', 'created_at'])]
+        constraints = [
+            models.UniqueConstraint(fields=['booking'], name='unique_review_per_booking'),
+        ]
+
+
 class Payment(models.Model):
     PAYMENT_STATUS_CHOICES = [
         ('PENDING', 'Pending'),
@@ -75,14 +112,134 @@ class Payment(models.Model):
     class Meta:
         ordering = ['-created_at']
     
+    # Allowed status changes; FAILED -> PENDING lets a failed payment be
+    # retried, FAILED -> COMPLETED covers the gateway confirming a charge we
+    # had marked failed (e.g. after an initiate timeout)
+    ALLOWED_TRANSITIONS = {
+        'PENDING': {'COMPLETED', 'FAILED', 'CANCELLED'},
+        'FAILED': {'PENDING', 'COMPLETED'},
+    }
+
     def __str__(self):
         return f"Payment {self.transaction_reference} - {self.status}"
-    
+
+    def transition_to(self, new_status, **fields):
+        """
+        Move the payment to new_status with a single conditional UPDATE
+        (compare-and-swap on the current status).
+
+        Returns True only for the call that actually won the transition, so
+        racing webhook and verify calls can't both run completion side effects.
+        """
+        old_status = self.status
+        if new_status not in self.ALLOWED_TRANSITIONS.get(old_status, ()):
+            return False
+
+        fields['updated_at'] = timezone.now()
+        won = Payment.objects.filter(pk=self.pk, status=old_status).update(
+            status=new_status, **fields
+        ) == 1
+        if won:
+            self.status = new_status
+            for name, value in fields.items():
+                setattr(self, name, value)
+            payment_status_changed.send(sender=Payment, instance=self, old_status=old_status)
+        return won
+
     def mark_as_completed(self):
-        self.status = 'COMPLETED'
-        self.completed_at = timezone.now()
-        self.save()
-    
+        return self.transition_to('COMPLETED', completed_at=timezone.now())
+
     def mark_as_failed(self):
-        self.status = 'FAILED'
-        self.save()
\ No newline at end of file
+        return self.transition_to('FAILED')
+
+    def mark_as_cancelled(self):
+        return self.transition_to('CANCELLED')
+
+    def reopen(self):
+        return self.transition_to('PENDING')
+
+
+class OutboxEvent(models.Model):
+    """
+    Side effect recorded in the same transaction as the state change
+    that caused it, published to Celery later by the outbox relay.
+    """
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    dedupe_key = models.CharField(max_length=255, unique=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    published_at = models.DateTimeField(null=True, blank=True)
+    # Set when the relay gives up on the event (see OUTBOX_MAX_ATTEMPTS)
+    dead_at = models.DateTimeField(null=True, blank=True)
+    # Set by the consuming task, so redeliveries are skipped
+    handled_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [models.Index(fields=['published_at', 'id'])]
+
+    def __str__(self):
+        return f"{self.event_type} ({self.dedupe_key})"
+
+
+class ListingOccupancy(models.Model):
+    """Packed one-bit-per-day occupancy of a listing (see listings/occupancy.py)"""
+    listing = models.OneToOneField(
+        Listing, on_delete=models.CASCADE, primary_key=True, related_name='occupancy'
+    )
+    window_start = models.DateField()
+    bits = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class ArchivedRecord(models.Model):
+    """
+    Index entry for a booking, payment or review moved out of the hot
+    tables into a compressed NDJSON segment (see listings/archive.py).
+    """
+    MODEL_CHOICES = [
+        ('booking', 'Booking'),
+        ('payment', 'Payment'),
+        ('review', 'Review'),
+    ]
+
+    model_name = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.CharField(max_length=64)
+    chapa_tx_ref = models.CharField(max_length=100, null=True, blank=True, db_index=True)
+    segment = models.CharField(max_length=255)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['model_name', 'object_id'], name='unique_archived_record'),
+        ]
+
+    def __str__(self):
+        return f"{self.model_name} {self.object_id}"
+
+
+class BookingSummary(models.Model):
+    """
+    Denormalized per-guest booking row behind the my-bookings endpoint,
+    kept up to date from Booking, Listing and Payment changes
+    (see listings/summaries.py).
+    """
+    booking = models.OneToOneField(
+        Booking, on_delete=models.CASCADE, primary_key=True, related_name='summary'
+    )
+    guest = models.ForeignKey(User, on_delete=models.CASCADE, related_name='booking_summaries')
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='+')
+    listing_title = models.CharField(max_length=255)
+    check_in = models.DateField()
+    check_out = models.DateField()
+    booking_status = models.CharField(max_length=20)
+    payment_status = models.CharField(max_length=20, blank=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    currency = models.CharField(max_length=3, blank=True)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=['guest', '-created_at'])]
@@ -0,0 +1,138 @@
+# listings/moderation.py
+"""
+Review moderation and batched rating aggregates.
+
+Reviews are validated in the request and stored as `pending`. A Celery
+beat task then takes pending reviews in batches, classifies their text
+with a local keyword/heuristic model, and folds the accepted ratings into
+Listing.review_count/rating_sum with one UPDATE per listing per batch,
+however many reviews that listing received.
+
+Review.counted_rating records what each review currently contributes to
+the aggregates, so edits (which send a review back to `pending`),
+rejections and deletes can all be applied as deltas.
+"""
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Listing, Review
+
+URL_PATTERN = re.compile(r'(https?://|www\.)\S+', re.IGNORECASE)
+REPEATED_CHAR_PATTERN = re.compile(r'(.)\1{9,}')
+
+
+# -------------------
+# Classifier
+# -------------------
+class KeywordModerator:
+    """Cheap local text model: blocked terms, link spam, shouting and junk"""
+
+    def __init__(self, blocked_terms=(), max_links=0, max_caps_ratio=0.7, min_letters=2):
+        terms = [re.escape(term.lower()) for term in blocked_terms if term.strip()]
+        self.blocked = re.compile(r'\b(' + '|'.join(terms) + r')\b') if terms else None
+        self.max_links = max_links
+        self.max_caps_ratio = max_caps_ratio
+        self.min_letters = min_letters
+
+    def classify(self, text):
+        """Returns (approved, reason); reason is empty for approved text"""
+        if self.blocked is not None and self.blocked.search(text.lower()):
+            return False, 'blocked_term'
+        if len(URL_PATTERN.findall(text)) > self.max_links:
+            return False, 'links'
+        if REPEATED_CHAR_PATTERN.search(text):
+            return False, 'repeated_characters'
+        letters = [c for c in text if c.isalpha()]
+        if len(letters) < self.min_letters:
+            return False, 'no_text'
+        # Only judge shouting on text long enough for it to mean something
+        if len(letters) >= 20:
+            caps = sum(1 for c in letters if c.isupper())
+            if caps / len(letters) > self.max_caps_ratio:
+                return False, 'shouting'
+        return True, ''
+
+
+def get_moderator():
+    return KeywordModerator(blocked_terms=settings.REVIEW_BLOCKED_TERMS)
+
+
+# -------------------
+# Batches
+# -------------------
+def moderate_batch(batch_size=500, moderator=None):
+    """
+    Moderate up to batch_size pending reviews and apply their aggregate
+    deltas. Returns counts, or None when there was nothing pending.
+    """
+    moderator = moderator or get_moderator()
+    now = timezone.now()
+
+    with transaction.atomic():
+        # skip_locked lets several workers drain the queue side by side
+        pending = list(
+            Review.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(moderation_status='pending')
+            .order_by('created_at')
+            .values_list('pk', 'comment', 'rating', 'counted_rating', 'booking__listing_id')
+            [:batch_size]
+        )
+        if not pending:
+            return None
+
+        decisions = defaultdict(list)
+        count_deltas = defaultdict(int)
+        rating_deltas = defaultdict(int)
+        for pk, comment, rating, counted, listing_id in pending:
+            approved, reason = moderator.classify(comment)
+            decisions[approved, reason].append(pk)
+            new_counted = rating if approved else None
+            count_deltas[listing_id] += (new_counted is not None) - (counted is not None)
+            rating_deltas[listing_id] += (new_counted or 0) - (counted or 0)
+
+        for (approved, reason), pks in decisions.items():
+            Review.objects.filter(pk__in=pks).update(
+                moderation_status='approved' if approved else 'rejected',
+                moderation_reason=reason,
+                moderated_at=now,
+                counted_rating=F('rating') if approved else None,
+            )
+
+        # One UPDATE per listing; sorted so concurrent batches lock listings
+        # in the same order
+        for listing_id in sorted(count_deltas, key=str):
+            count_delta, rating_delta = count_deltas[listing_id], rating_deltas[listing_id]
+            if count_delta or rating_delta:
+                Listing.objects.filter(pk=listing_id).update(
+                    review_count=F('review_count') + count_delta,
+                    rating_sum=F('rating_sum') + rating_delta,
+                )
+
+    approved = sum(len(pks) for (ok, _), pks in decisions.items() if ok)
+    return {
+        'reviews': len(pending),
+        'approved': approved,
+        'rejected': len(pending) - approved,
+        'listings': len(count_deltas),
+    }
+
+
+def moderate_pending_reviews(batch_size=None, max_batches=None):
+    """Drain the pending queue batch by batch; returns totals"""
+    batch_size = batch_size or settings.REVIEW_MODERATION_BATCH_SIZE
+    moderator = get_moderator()
+    totals = defaultdict(int)
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        counts = moderate_batch(batch_size, moderator)
+        if counts is None:
+            break
+        batches += 1
+        for name, count in counts.items():
+            totals[name] += count
+    return dict(totals)
@@ -0,0 +1,140 @@
+# listings/occupancy.py
+"""
+Per-listing occupancy bitmaps.
+
+Each listing gets one bit per day over a rolling window (a year back and
+about a year ahead of the current month), packed into a BinaryField on
+ListingOccupancy. Bitmaps are rebuilt from Booking rows when bookings
+change, so calendar and "free on all of these dates" queries over many
+listings are a few NumPy bitwise operations on packed bytes instead of
+interval queries.
+"""
+import datetime
+
+import numpy as np
+from django.db import connection
+from django.utils import timezone
+
+from .models import Booking, Listing, ListingOccupancy
+
+# 92 bytes per listing
+WINDOW_DAYS = 736
+MAX_LISTINGS = 1000
+
+
+def current_window_start(today=None):
+    today = today or timezone.localdate()
+    return datetime.date(today.year - 1, today.month, 1)
+
+
+def _day_offset(start, day):
+    return (day - start).days
+
+
+# -------------------
+# Building
+# -------------------
+def compute(listing_ids, start):
+    """Packed bitmaps for the given listings, one query for all their bookings"""
+    listing_ids = list(listing_ids)
+    row_of = {listing_id: row for row, listing_id in enumerate(listing_ids)}
+    days = np.zeros((len(listing_ids), WINDOW_DAYS), dtype=bool)
+    end = start + datetime.timedelta(days=WINDOW_DAYS)
+
+    bookings = (
+        Booking.objects.filter(listing_id__in=listing_ids, check_in__lt=end, check_out__gt=start)
+        .exclude(status='canceled')
+        .values_list('listing_id', 'check_in', 'check_out')
+    )
+    for listing_id, check_in, check_out in bookings:
+        first = max(_day_offset(start, check_in), 0)
+        last = min(_day_offset(start, check_out), WINDOW_DAYS)
+        days[row_of[listing_id], first:last] = True
+
+    packed = np.packbits(days, axis=1)
+    return {listing_id: packed[row].tobytes() for listing_id, row in row_of.items()}
+
+
+def rebuild(listing_ids, start=None):
+    """Recompute and store bitmaps; ids of listings that no longer exist are ignored"""
+    start = start or current_window_start()
+    listing_ids = list(Listing.objects.filter(pk__in=set(listing_ids)).values_list('pk', flat=True))
+    if not listing_ids:
+        return {}
+
+    bitmaps = compute(listing_ids, start)
+    ListingOccupancy.objects.bulk_create(
+        [
+            ListingOccupancy(listing_id=listing_id, window_start=start, bits=bits)
+            for listing_id, bits in bitmaps.items()
+        ],
+        update_conflicts=True,
+        # MySQL's ON DUPLICATE KEY UPDATE takes no conflict target
+        unique_fields=['listing'] if connection.features.supports_update_conflicts_with_target else None,
+        update_fields=['window_start', 'bits', 'updated_at'],
+    )
+    return bitmaps
+
+
+def booking_in_window(check_in, check_out, start=None):
+    # Unsaved-field values may still be ISO strings (Booking(check_in='2030-01-01'))
+    check_in = Booking._meta.get_field('check_in').to_python(check_in)
+    check_out = Booking._meta.get_field('check_out').to_python(check_out)
+    start = start or current_window_start()
+    end = start + datetime.timedelta(days=WINDOW_DAYS)
+    return check_in < end and check_out > start
+
+
+# -------------------
+# Querying
+# -------------------
+def load(listing_ids, start=None):
+    """
+    (ids, matrix) where matrix is a uint8 array of packed bitmaps, one row
+    per existing listing. Missing or stale bitmaps are rebuilt on the way.
+    """
+    start = start or current_window_start()
+    listing_ids = list(dict.fromkeys(listing_ids))
+    bitmaps = dict(
+        ListingOccupancy.objects.filter(listing_id__in=listing_ids, window_start=start)
+        .values_list('listing_id', 'bits')
+    )
+    missing = [listing_id for listing_id in listing_ids if listing_id not in bitmaps]
+    if missing:
+        bitmaps.update(rebuild(missing, start))
+
+    ids = [listing_id for listing_id in listing_ids if listing_id in bitmaps]
+    matrix = np.frombuffer(b''.join(bytes(bitmaps[i]) for i in ids), dtype=np.uint8)
+    return ids, matrix.reshape(len(ids), WINDOW_DAYS // 8)
+
+
+def range_mask(start, date_from, date_to):
+    """Packed mask with the bits for date_from..date_to (inclusive) set"""
+    days = np.zeros(WINDOW_DAYS, dtype=bool)
+    days[_day_offset(start, date_from):_day_offset(start, date_to) + 1] = True
+    return np.packbits(days)
+
+
+def in_window(start, date_from, date_to):
+    return 0 <= _day_offset(start, date_from) <= _day_offset(start, date_to) < WINDOW_DAYS
+
+
+def calendar(listing_ids, date_from, date_to):
+    """
+    Per-listing day occupancy for date_from..date_to (inclusive).
+    Returns (ids, bool matrix of shape (len(ids), days), free-for-the-whole-range flags).
+    """
+    start = current_window_start()
+    ids, matrix = load(listing_ids, start)
+    free = ~np.any(matrix & range_mask(start, date_from, date_to), axis=1)
+    days = np.unpackbits(matrix, axis=1).astype(bool)
+    days = days[:, _day_offset(start, date_from):_day_offset(start, date_to) + 1]
+    return ids, days, free
+
+
+def free_listings(listing_ids, date_from, date_to):
+    """Ids of the listings with no booked day in date_from..date_to (inclusive)"""
+    start = current_window_start()
+    ids, matrix = load(listing_ids, start)
+    free = ~np.any(matrix & range_mask(start, date_from, date_to), axis=1)
+    return [listing_id for listing_id, is_free in zip(ids, free) if is_free]
@@ -0,0 +1,179 @@
+# listings/outbox.py
+"""
+Transactional outbox for side effects of payment state changes.
+
+Events are written in the same database transaction as the change that
+caused them and published to Celery afterwards by relay_outbox(), so a
+crash or a broker outage can delay a side effect but never lose it, and
+the request path never talks to the broker.
+
+Delivery is at-least-once; consumers wrap their work in handle_once() so
+a redelivered event is not acted on twice. Events that keep failing to
+publish are dead-lettered (dead_at) after settings.OUTBOX_MAX_ATTEMPTS so
+they can't block the relay; `manage.py relay_outbox --retry-dead` puts
+them back in the queue.
+"""
+import logging
+
+from celery import current_app
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+PAYMENT_COMPLETED = 'payment.completed'
+
+# Event type -> name of the Celery task that handles it
+EVENT_TASKS = {
+    PAYMENT_COMPLETED: 'listings.tasks.send_payment_confirmation_email',
+}
+
+
+# -------------------
+# Writing events
+# -------------------
+def enqueue(event_type, payload, dedupe_key):
+    """
+    Record an event. Call inside the transaction that makes the state change.
+    Returns False if an event with the same dedupe key already exists.
+    """
+    _, created = OutboxEvent.objects.get_or_create(
+        dedupe_key=dedupe_key,
+        defaults={'event_type': event_type, 'payload': payload},
+    )
+    return created
+
+
+def enqueue_payment_completed(payment):
+    """Queue the confirmation email for a completed payment"""
+    return enqueue(
+        PAYMENT_COMPLETED,
+        {'booking_id': str(payment.booking_id), 'payment_id': payment.pk},
+        dedupe_key=f'{PAYMENT_COMPLETED}:{payment.pk}',
+    )
+
+
+# -------------------
+# Relay
+# -------------------
+def relay_outbox(batch_size=100):
+    """
+    Publish one batch of pending events to Celery.
+
+    Delivery is at-least-once: rows are marked published only after the
+    broker accepted the message, so a crash in between republishes them.
+    Every message carries a stable task id (outbox-<pk>) for consumers that
+    need to recognise redeliveries. Returns the number of events published.
+    """
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(published_at__isnull=True, dead_at__isnull=True)
+            .order_by('id')[:batch_size]
+        )
+        if not events:
+            return 0
+
+        published = []
+        failed = {}
+        dead = set()
+        with current_app.producer_or_acquire() as producer:
+            for event in events:
+                task_name = EVENT_TASKS.get(event.event_type)
+                if task_name is None:
+                    # Retrying can't help; dead-letter it right away
+                    failed[event.pk] = f'No task registered for {event.event_type}'
+                    dead.add(event.pk)
+                    continue
+                try:
+                    current_app.send_task(
+                        task_name,
+                        kwargs=event.payload,
+                        task_id=f'outbox-{event.pk}',
+                        producer=producer,
+                    )
+                except Exception as e:
+                    # Broker trouble: keep the rest of the batch for the next run
+                    failed[event.pk] = str(e)
+                    break
+                published.append(event)
+
+        now = timezone.now()
+        if published:
+            OutboxEvent.objects.filter(pk__in=[e.pk for e in published]).update(
+                published_at=now, attempts=F('attempts') + 1
+            )
+        for pk, error in failed.items():
+            OutboxEvent.objects.filter(pk=pk).update(
+                attempts=F('attempts') + 1, last_error=error
+            )
+        if failed:
+            dead.update(
+                OutboxEvent.objects.filter(
+                    pk__in=list(failed), attempts__gte=settings.OUTBOX_MAX_ATTEMPTS
+                ).values_list('pk', flat=True)
+            )
+        if dead:
+            OutboxEvent.objects.filter(pk__in=dead).update(dead_at=now)
+
+    if published:
+        max_lag = max((now - e.created_at).total_seconds() for e in published)
+        logger.info('outbox: published %d events, max lag %.3fs', len(published), max_lag)
+    if failed:
+        logger.warning('outbox: %d events failed to publish: %s', len(failed), failed)
+    if dead:
+        logger.error('outbox: dead-lettered events %s', sorted(dead))
+    return len(published)
+
+
+def retry_dead_events():
+    """Put dead-lettered events back in the queue; returns how many"""
+    return OutboxEvent.objects.filter(dead_at__isnull=False, published_at__isnull=True).update(
+        dead_at=None, attempts=0
+    )
+
+
+def outbox_lag():
+    """Number of unpublished events and the age in seconds of the oldest one"""
+    pending = OutboxEvent.objects.filter(published_at__isnull=True, dead_at__isnull=True)
+    oldest = pending.order_by('id').values_list('created_at', flat=True).first()
+    return {
+        'pending': pending.count(),
+        'dead': OutboxEvent.objects.filter(published_at__isnull=True, dead_at__isnull=False).count(),
+        'oldest_age_seconds': (timezone.now() - oldest).total_seconds() if oldest else 0.0,
+    }
+
+# -------------------
+# Consuming
+# -------------------
+def event_pk(task_id):
+    """Outbox event pk from a relayed task id (outbox-<pk>), else None"""
+    prefix, _, pk = (task_id or '').partition('-')
+    return int(pk) if prefix == 'outbox' and pk.isdigit() else None
+
+
+def handle_once(task_id, handler, *args, **kwargs):
+    """
+    Run handler(*args, **kwargs) unless the outbox event behind task_id was
+    already handled. The event row stays locked while the handler runs, so
+    concurrent redeliveries wait and then skip. Returns False if skipped.
+    Tasks not started by the relay always run.
+    """
+    pk = event_pk(task_id)
+    if pk is None:
+        handler(*args, **kwargs)
+        return True
+    with transaction.atomic():
+        event = OutboxEvent.objects.select_for_update().filter(pk=pk).first()
+        if event is not None and event.handled_at is not None:
+            return False
+        handler(*args, **kwargs)
+        if event is not None:
+            event.handled_at = timezone.now()
+            event.save(update_fields=['handled_at'])
+    return True
+
@@ -0,0 +1,219 @@
+# listings/recommendations.py
+"""
+"Similar listings" recommendations.
+
+build_index() turns listing text into TF-IDF vectors and Booking rows into
+a listing x listing co-booking matrix, and writes both as CSR component
+arrays (.npy) under settings.RECOMMENDATIONS_DIR. Workers open them with
+mmap_mode='r', so every process on the host shares the same pages and a
+top-k query is a couple of sparse dot products, no ORM work.
+"""
+import math
+import os
+import re
+import shutil
+import time
+import uuid
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+from scipy import sparse
+
+from .models import Booking, Listing
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+STOP_WORDS = frozenset(
+    'a an and are as at be by for from has in is it its of on or the to with'.split()
+)
+
+# Weight of "guests also booked" relative to text similarity
+CO_BOOKING_WEIGHT = 0.5
+CURRENT_LINK = 'current'
+KEEP_VERSIONS = 2
+VERSION_RE = re.compile(r'^\d{14}(-[0-9a-f]{8})?$')
+
+
+# -------------------
+# Building
+# -------------------
+def _tokenize(text):
+    return [t for t in TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in STOP_WORDS]
+
+
+def _l2_normalize(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return (sparse.diags(1.0 / norms) @ matrix).astype(np.float32).tocsr()
+
+
+def build_tfidf(documents):
+    """Row-normalised TF-IDF matrix (one row per document)"""
+    counts = [Counter(_tokenize(doc)) for doc in documents]
+    doc_freq = Counter()
+    for c in counts:
+        doc_freq.update(c.keys())
+    vocabulary = {term: i for i, term in enumerate(sorted(doc_freq))}
+
+    n = len(documents)
+    idf = {term: math.log((1 + n) / (1 + df)) + 1 for term, df in doc_freq.items()}
+    rows, cols, values = [], [], []
+    for row, c in enumerate(counts):
+        for term, tf in c.items():
+            rows.append(row)
+            cols.append(vocabulary[term])
+            values.append((1 + math.log(tf)) * idf[term])
+
+    matrix = sparse.csr_matrix(
+        (np.asarray(values, dtype=np.float32), (rows, cols)),
+        shape=(n, len(vocabulary)),
+    )
+    return _l2_normalize(matrix)
+
+
+def build_cobooking(row_of, guest_listing_pairs):
+    """
+    Listing x listing matrix of guests who booked both, cosine-normalised
+    by how many guests booked each listing.
+    """
+    guests = {}
+    rows, cols = [], []
+    for guest_id, listing_id in set(guest_listing_pairs):
+        if listing_id not in row_of:
+            continue
+        rows.append(guests.setdefault(guest_id, len(guests)))
+        cols.append(row_of[listing_id])
+
+    n = len(row_of)
+    guest_matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+        shape=(len(guests), n),
+    )
+    matrix = (guest_matrix.T @ guest_matrix).tocsr()
+    bookers = matrix.diagonal()
+    bookers[bookers == 0] = 1.0
+    scale = sparse.diags(1.0 / np.sqrt(bookers))
+    matrix = (scale @ matrix @ scale).tocsr()
+    matrix.setdiag(0)
+    matrix.eliminate_zeros()
+    return matrix.astype(np.float32)
+
+
+def _save_csr(directory, name, matrix):
+    np.save(os.path.join(directory, f'{name}_data.npy'), matrix.data)
+    np.save(os.path.join(directory, f'{name}_indices.npy'), matrix.indices.astype(np.int32))
+    np.save(os.path.join(directory, f'{name}_indptr.npy'), matrix.indptr.astype(np.int32))
+    np.save(os.path.join(directory, f'{name}_shape.npy'), np.asarray(matrix.shape, dtype=np.int64))
+
+
+def build_index(root=None):
+    """
+    Rebuild the vectors from the database and publish them atomically by
+    swapping the `current` symlink. Returns the new version directory.
+    """
+    root = root or settings.RECOMMENDATIONS_DIR
+    os.makedirs(root, exist_ok=True)
+
+    listings = list(
+        Listing.objects.order_by('pk').values_list('pk', 'title', 'description', 'location')
+    )
+    ids = [str(pk) for pk, _, _, _ in listings]
+    row_of = {pk: row for row, (pk, _, _, _) in enumerate(listings)}
+
+    tfidf = build_tfidf([f'{title} {description} {location}' for _, title, description, location in listings])
+    cobooking = build_cobooking(
+        row_of,
+        Booking.objects.exclude(status='canceled').values_list('guest_id', 'listing_id').iterator(),
+    )
+
+    # Unique per build, so a manual run and the beat task in the same second
+    # don't collide; names still sort by build time
+    version = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    directory = os.path.join(root, version)
+    tmp_directory = directory + '.tmp'
+    try:
+        os.makedirs(tmp_directory)
+        np.save(os.path.join(tmp_directory, 'ids.npy'), np.asarray(ids, dtype='U36'))
+        _save_csr(tmp_directory, 'tfidf', tfidf)
+        _save_csr(tmp_directory, 'cobooking', cobooking)
+        os.rename(tmp_directory, directory)
+    except BaseException:
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        raise
+
+    tmp_link = os.path.join(root, f'{CURRENT_LINK}.{version}.tmp')
+    os.symlink(version, tmp_link)
+    os.replace(tmp_link, os.path.join(root, CURRENT_LINK))
+
+    # Workers still holding the previous version keep reading it until they
+    # reload; never remove what `current` points at, even if a concurrent
+    # build replaced it after us
+    live = {version, os.readlink(os.path.join(root, CURRENT_LINK))}
+    versions = sorted(
+        (name for name in os.listdir(root)
+         if VERSION_RE.match(name) and os.path.isdir(os.path.join(root, name))),
+        key=lambda name: (os.path.getmtime(os.path.join(root, name)), name),
+    )
+    for old in versions[:-KEEP_VERSIONS]:
+        if old not in live:
+            shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return directory
+
+
+# -------------------
+# Querying
+# -------------------
+def _load_csr(directory, name):
+    def load(part):
+        return np.load(os.path.join(directory, f'{name}_{part}.npy'), mmap_mode='r')
+
+    shape = tuple(np.load(os.path.join(directory, f'{name}_shape.npy')))
+    return sparse.csr_matrix((load('data'), load('indices'), load('indptr')), shape=shape)
+
+
+class RecommendationIndex:
+    """Read-only view over one published version of the vectors"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.ids = np.load(os.path.join(directory, 'ids.npy'), mmap_mode='r')
+        self.row_of = {listing_id: row for row, listing_id in enumerate(self.ids.tolist())}
+        self.tfidf = _load_csr(directory, 'tfidf')
+        self.cobooking = _load_csr(directory, 'cobooking')
+
+    def similar(self, listing_id, k=10):
+        """Top-k (listing_id, score) pairs, best first"""
+        row = self.row_of.get(str(listing_id))
+        if row is None or len(self.ids) < 2:
+            return []
+
+        scores = np.asarray((self.tfidf @ self.tfidf[row].T).todense()).ravel()
+        scores += CO_BOOKING_WEIGHT * np.asarray(self.cobooking[row].todense()).ravel()
+        scores[row] = 0.0
+
+        k = min(k, len(scores) - 1)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(str(self.ids[i]), float(scores[i])) for i in top if scores[i] > 0]
+
+
+_index = None
+
+
+def get_index():
+    """The current index, reloaded when a rebuild has swapped the symlink"""
+    global _index
+    link = os.path.join(settings.RECOMMENDATIONS_DIR, CURRENT_LINK)
+    if not os.path.exists(link):
+        return None
+    directory = os.path.realpath(link)
+    if _index is None or _index.directory != directory:
+        _index = RecommendationIndex(directory)
+    return _index
+
+
+def similar_listings(listing_id, k=10):
+    index = get_index()
+    if index is None:
+        return []
+    return index.similar(listing_id, k)
@@ -1,6 +1,8 @@
 # listings/serializers.py
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Listing, Booking, Review, Payment
+from .models import Listing, Booking, BookingSummary, Review, Payment
 
 # -------------------
 # Listing Serializers
@@ -20,10 +22,16 @@ class BookingSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Booking
-        fields = ['id', 'listing', 'listing_title', 'user', 'check_in_date', 
-                 'check_out_date', 'guests', 'total_price', 'status', 
-                 'created_at', 'updated_at']
-        read_only_fields = ['user', 'total_price', 'status']
+        fields = ['booking_id', 'listing', 'listing_title', 'guest', 'check_in',
+                 'check_out', 'status', 'created_at']
+        read_only_fields = ['guest', 'status']
+
+
+class BookingSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BookingSummary
+        fields = ['booking', 'listing', 'listing_title', 'check_in', 'check_out',
+                  'booking_status', 'payment_status', 'amount', 'currency', 'created_at']
 
 
 # -------------------
@@ -47,7 +55,51 @@ class PaymentSerializer(serializers.ModelSerializer):
 # -------------------
 class ReviewSerializer(serializers.ModelSerializer):
     booking = BookingSerializer(read_only=True)
+    booking_id = serializers.PrimaryKeyRelatedField(
+        source='booking', queryset=Booking.objects.all(), write_only=True
+    )
 
     class Meta:
         model = Review
-        fields = '__all__'
\ No newline at end of file
+        fields = ['review_id', 'booking', 'booking_id', 'rating', 'comment',
+                  'moderation_status', 'created_at']
+        read_only_fields = ['moderation_status']
+
+    def validate(self, attrs):
+        booking = attrs.get('booking') or getattr(self.instance, 'booking', None)
+        if self.instance is not None and booking.pk != self.instance.booking_id:
+            raise serializers.ValidationError({'booking_id': 'A review cannot be moved to another booking.'})
+
+        request = self.context.get('request')
+        if request is not None and (
+            not request.user.is_authenticated or booking.guest_id != request.user.pk
+        ):
+            raise serializers.ValidationError({'booking_id': 'You can only review your own bookings.'})
+        if booking.status != 'confirmed' or booking.check_out > timezone.localdate():
+            raise serializers.ValidationError({'booking_id': 'Only completed stays can be reviewed.'})
+
+        duplicates = Review.objects.filter(booking=booking)
+        if self.instance is not None:
+            duplicates = duplicates.exclude(pk=self.instance.pk)
+        if duplicates.exists():
+            raise serializers.ValidationError({'booking_id': 'This booking has already been reviewed.'})
+        return attrs
+
+    def create(self, validated_data):
+        # The unique constraint settles concurrent posts for the same booking
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError({'booking_id': 'This booking has already been reviewed.'})
+
+    def update(self, instance, validated_data):
+        # Edited text goes back through moderation; its old rating keeps
+        # counting until the next batch replaces it. A single UPDATE so the
+        # moderation fields owned by the batches (counted_rating, ...) are
+        # never written back from this possibly stale instance.
+        validated_data['moderation_status'] = 'pending'
+        Review.objects.filter(pk=instance.pk).update(**validated_data)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        return instance
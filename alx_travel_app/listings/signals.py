@@ -0,0 +1,117 @@
+# listings/signals.py
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import summaries
+from .archive import is_archiving
+from .models import Booking, Listing, Payment, Review, payment_status_changed
+
+
+@receiver(pre_save, sender=Booking)
+def remember_previous_stay(sender, instance, **kwargs):
+    instance._previous_stay = None
+    if not instance._state.adding:
+        instance._previous_stay = (
+            Booking.objects.filter(pk=instance.pk)
+            .values_list('listing_id', 'check_in', 'check_out')
+            .first()
+        )
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def refresh_listing_occupancy(sender, instance, **kwargs):
+    """Rebuild the occupancy bitmaps of the listings the booking was and is on"""
+    # occupancy pulls in NumPy; keep it off the worker boot path
+    from . import occupancy
+
+    stays = [(instance.listing_id, instance.check_in, instance.check_out)]
+    previous = getattr(instance, '_previous_stay', None)
+    if previous is not None:
+        stays.append(previous)
+    listing_ids = {
+        listing_id for listing_id, check_in, check_out in stays
+        if occupancy.booking_in_window(check_in, check_out)
+    }
+    if listing_ids:
+        transaction.on_commit(lambda: occupancy.rebuild(listing_ids))
+
+
+# -------------------
+# Booking summaries
+# -------------------
+@receiver(post_save, sender=Booking)
+def refresh_booking_summary(sender, instance, **kwargs):
+    booking_id = instance.pk
+    transaction.on_commit(lambda: summaries.sync_bookings([booking_id]))
+
+
+@receiver(post_delete, sender=Booking)
+def forget_booking_summary(sender, instance, **kwargs):
+    # The summary row goes with the booking (CASCADE); drop the cached pages
+    guest_id = instance.guest_id
+    transaction.on_commit(lambda: summaries.invalidate([guest_id]))
+
+
+@receiver(pre_save, sender=Listing)
+def remember_previous_title(sender, instance, **kwargs):
+    instance._previous_title = None
+    if not instance._state.adding:
+        instance._previous_title = (
+            Listing.objects.filter(pk=instance.pk).values_list('title', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Listing)
+def refresh_summary_titles(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_title', None)
+    if created or previous is None or previous == instance.title:
+        return
+    listing_id, title = instance.pk, instance.title
+    transaction.on_commit(lambda: summaries.sync_listing_title(listing_id, title))
+
+
+# Fields of Payment copied into BookingSummary
+SUMMARY_PAYMENT_FIELDS = {'status', 'amount', 'currency'}
+
+
+@receiver(post_save, sender=Payment)
+@receiver(payment_status_changed, sender=Payment)
+def refresh_summary_payment(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not SUMMARY_PAYMENT_FIELDS & set(update_fields):
+        return
+    # Re-read the row: the saved instance may be stale (e.g. verify_payment
+    # storing its response after a webhook completed the payment)
+    booking_id = instance.booking_id
+    transaction.on_commit(lambda: summaries.sync_bookings([booking_id]))
+
+
+# -------------------
+# Review aggregates
+# -------------------
+# Additions and edits are applied in batches by listings/moderation.py;
+# only deletes are applied here, as they happen.
+@receiver(pre_delete, sender=Review)
+def lock_counted_rating(sender, instance, **kwargs):
+    # The instance may predate a moderation batch; re-read what it counts
+    # for under a row lock (held until the delete commits) so a concurrent
+    # batch can't change it in between
+    if is_archiving():
+        return
+    instance.counted_rating = (
+        Review.objects.select_for_update().filter(pk=instance.pk)
+        .values_list('counted_rating', flat=True).first()
+    )
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_from_aggregates(sender, instance, **kwargs):
+    # Archived reviews keep counting towards the listing's rating
+    if is_archiving() or instance.counted_rating is None:
+        return
+    Listing.objects.filter(bookings__pk=instance.booking_id).update(
+        review_count=F('review_count') - 1,
+        rating_sum=F('rating_sum') - instance.counted_rating,
+    )
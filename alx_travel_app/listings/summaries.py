@@ -0,0 +1,87 @@
+# listings/summaries.py
+"""
+Incremental maintenance of BookingSummary rows and the per-user
+my-bookings cache.
+
+Each change touches only the affected summary rows and bumps the cache
+version of the guests involved, so cached pages of other users stay valid.
+"""
+import uuid
+
+from django.core.cache import cache
+from django.db import connection
+
+from .models import Booking, BookingSummary
+
+SUMMARY_FIELDS = [
+    'guest', 'listing', 'listing_title', 'check_in', 'check_out',
+    'booking_status', 'payment_status', 'amount', 'currency', 'created_at',
+]
+
+
+# -------------------
+# Cache versions
+# -------------------
+def _version_key(guest_id):
+    return f'my-bookings:version:{guest_id}'
+
+
+def cache_version(guest_id):
+    return cache.get_or_set(_version_key(guest_id), lambda: uuid.uuid4().hex, None)
+
+
+def invalidate(guest_ids):
+    """Start a new cache version for each guest; old pages simply expire"""
+    guest_ids = set(guest_ids)
+    if guest_ids:
+        cache.set_many({_version_key(g): uuid.uuid4().hex for g in guest_ids}, None)
+
+
+# -------------------
+# Maintenance
+# -------------------
+def sync_bookings(booking_ids):
+    """Upsert the summaries of the given bookings (one read, one write)"""
+    booking_ids = set(booking_ids)
+    # Guests currently holding these rows; a booking moved to another guest
+    # must drop out of the previous guest's cached pages too
+    previous_guests = set(
+        BookingSummary.objects.filter(booking_id__in=booking_ids).values_list('guest_id', flat=True)
+    )
+    bookings = (
+        Booking.objects.filter(pk__in=booking_ids)
+        .select_related('listing', 'payment')
+    )
+    summaries = []
+    for booking in bookings:
+        payment = getattr(booking, 'payment', None)
+        summaries.append(BookingSummary(
+            booking_id=booking.pk,
+            guest_id=booking.guest_id,
+            listing_id=booking.listing_id,
+            listing_title=booking.listing.title,
+            check_in=booking.check_in,
+            check_out=booking.check_out,
+            booking_status=booking.status,
+            payment_status=payment.status if payment else '',
+            amount=payment.amount if payment else None,
+            currency=payment.currency if payment else '',
+            created_at=booking.created_at,
+        ))
+    if summaries:
+        BookingSummary.objects.bulk_create(
+            summaries,
+            update_conflicts=True,
+            # MySQL's ON DUPLICATE KEY UPDATE takes no conflict target
+            unique_fields=['booking'] if connection.features.supports_update_conflicts_with_target else None,
+            update_fields=SUMMARY_FIELDS,
+        )
+    invalidate(previous_guests | {s.guest_id for s in summaries})
+
+
+def sync_listing_title(listing_id, title):
+    updated = BookingSummary.objects.filter(listing_id=listing_id).exclude(listing_title=title)
+    guest_ids = list(updated.values_list('guest_id', flat=True).distinct())
+    if guest_ids:
+        updated.update(listing_title=title)
+        invalidate(guest_ids)
@@ -0,0 +1,75 @@
+# listings/tasks.py
+from celery import shared_task
+from django.conf import settings
+from django.core.mail import send_mail
+from django.template.loader import render_to_string
+from django.utils.html import strip_tags
+
+from .archive import archive_old_records
+from .models import Booking, Payment
+from .moderation import moderate_pending_reviews
+from .outbox import handle_once, relay_outbox
+
+
+def _send_payment_confirmation(booking, payment):
+    subject = f'Payment Confirmed - Booking #{booking.pk}'
+
+    context = {
+        'booking': booking,
+        'payment': payment,
+        'listing': booking.listing,
+        'user': booking.guest
+    }
+
+    html_message = render_to_string('emails/payment_confirmation.html', context)
+    plain_message = strip_tags(html_message)
+
+    send_mail(
+        subject,
+        plain_message,
+        'noreply@alxtravel.com',
+        [booking.guest.email],
+        html_message=html_message,
+        fail_silently=False,
+    )
+
+
+@shared_task(bind=True)
+def send_payment_confirmation_email(self, booking_id, payment_id):
+    """Send payment confirmation email using Celery (once per outbox event)"""
+    try:
+        booking = Booking.objects.select_related('listing', 'guest').get(pk=booking_id)
+        payment = Payment.objects.get(pk=payment_id)
+
+        if not handle_once(self.request.id, _send_payment_confirmation, booking, payment):
+            return f"Email already sent for {self.request.id}"
+        return f"Email sent to {booking.guest.email}"
+    except Exception as e:
+        return f"Failed to send email: {str(e)}"
+
+
+@shared_task
+def relay_outbox_events():
+    """Publish pending outbox events (scheduled by celery beat)"""
+    return relay_outbox(batch_size=settings.OUTBOX_BATCH_SIZE)
+
+
+@shared_task
+def rebuild_recommendations():
+    """Nightly rebuild of the similar-listings vectors"""
+    # NumPy/SciPy are only needed here, not on every worker boot
+    from .recommendations import build_index
+
+    return build_index()
+
+
+@shared_task
+def archive_old_bookings():
+    """Move bookings, payments and reviews older than ARCHIVE_HORIZON_DAYS to the archive"""
+    return archive_old_records()
+
+
+@shared_task
+def moderate_reviews():
+    """Moderate pending reviews and apply their rating aggregates in batches"""
+    return moderate_pending_reviews(max_batches=settings.REVIEW_MODERATION_MAX_BATCHES)
@@ -1,3 +1,417 @@
-from django.test import TestCase
+import datetime
+import hashlib
+import hmac
+import json
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import archive, bulk, moderation, outbox, views
+from .fast_serializers import compile_serializer
+from .middleware import AdaptiveLimit
+from .models import (
+    Booking, BookingSummary, Listing, OutboxEvent, Payment, Review, payment_status_changed
+)
+from .tasks import send_payment_confirmation_email
+from .serializers import BookingSummarySerializer
+
+User = get_user_model()
+
+
+def make_listing(host, title='Sea view flat'):
+    return Listing.objects.create(
+        title=title, description='Two rooms by the sea', location='Addis Ababa',
+        price_per_night='100.00', host=host,
+    )
+
+
+def make_booking(listing, guest, check_in=datetime.date(2030, 1, 1), nights=2, **fields):
+    return Booking.objects.create(
+        listing=listing, guest=guest, check_in=check_in,
+        check_out=check_in + datetime.timedelta(days=nights), **fields,
+    )
+
+
+# -------------------
+# Startup profiling
+# -------------------
+class ProfileStartupTests(SimpleTestCase):
+    """Boot-time regression checks (listings/management/commands/profile_startup.py)"""
+
+    def test_boot_keeps_heavy_modules_lazy(self):
+        for target in ('setup', 'web', 'worker'):
+            with self.subTest(target=target):
+                call_command(
+                    'profile_startup', target=target, check_lazy=True, max_seconds=10,
+                    stdout=StringIO(),
+                )
+
+
+# -------------------
+# Outbox
+# -------------------
+class OutboxTests(TestCase):
+    def setUp(self):
+        guest = User.objects.create(username='guest', email='guest@example.com')
+        self.payment = Payment.objects.create(
+            booking=make_booking(make_listing(guest), guest), amount='200.00',
+            first_name='Abebe', last_name='Kebede', email='guest@example.com', chapa_tx_ref='tx-1',
+        )
+        patcher = mock.patch.object(outbox, 'current_app')
+        self.app = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_enqueue_is_deduplicated(self):
+        self.assertTrue(outbox.enqueue_payment_completed(self.payment))
+        self.assertFalse(outbox.enqueue_payment_completed(self.payment))
+        self.assertEqual(OutboxEvent.objects.count(), 1)
+
+    def test_failed_publish_is_retried(self):
+        outbox.enqueue_payment_completed(self.payment)
+        self.app.send_task.side_effect = ConnectionError('broker down')
+        self.assertEqual(outbox.relay_outbox(), 0)
+        event = OutboxEvent.objects.get()
+        self.assertIsNone(event.published_at)
+        self.assertEqual((event.attempts, event.last_error), (1, 'broker down'))
+
+        self.app.send_task.side_effect = None
+        self.assertEqual(outbox.relay_outbox(), 1)
+        event.refresh_from_db()
+        self.assertIsNotNone(event.published_at)
+        self.assertEqual(self.app.send_task.call_args.kwargs['task_id'], f'outbox-{event.pk}')
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2)
+    def test_failing_events_are_dead_lettered(self):
+        outbox.enqueue('unknown.event', {}, dedupe_key='unknown:1')
+        outbox.enqueue_payment_completed(self.payment)
+        # The unknown event can't hold back the one behind it
+        self.assertEqual(outbox.relay_outbox(batch_size=1), 0)
+        self.assertEqual(outbox.relay_outbox(batch_size=1), 1)
+        self.assertIsNotNone(OutboxEvent.objects.get(dedupe_key='unknown:1').dead_at)
+
+        outbox.enqueue('payment.completed', {}, dedupe_key='retry:1')
+        self.app.send_task.side_effect = ConnectionError('broker down')
+        outbox.relay_outbox()
+        outbox.relay_outbox()
+        self.assertIsNotNone(OutboxEvent.objects.get(dedupe_key='retry:1').dead_at)
+        self.assertEqual(outbox.outbox_lag()['pending'], 0)
+
+        self.assertEqual(outbox.retry_dead_events(), 2)
+        self.assertEqual(outbox.outbox_lag()['pending'], 2)
+
+    @mock.patch('listings.tasks.render_to_string', return_value='<p>Confirmed</p>')
+    def test_redelivered_event_sends_one_email(self, render):
+        outbox.enqueue_payment_completed(self.payment)
+        event = OutboxEvent.objects.get()
+        for _ in range(2):
+            send_payment_confirmation_email.apply(
+                kwargs=event.payload, task_id=f'outbox-{event.pk}'
+            )
+        self.assertEqual(len(mail.outbox), 1)
+        event.refresh_from_db()
+        self.assertIsNotNone(event.handled_at)
+
+
+# -------------------
+# Payment transitions
+# -------------------
+class PaymentTransitionTests(TestCase):
+    def setUp(self):
+        guest = User.objects.create(username='guest')
+        self.payment = Payment.objects.create(
+            booking=make_booking(make_listing(guest), guest), amount='200.00',
+            first_name='Abebe', last_name='Kebede', email='guest@example.com', chapa_tx_ref='tx-1',
+        )
+
+    def test_only_one_racing_call_wins(self):
+        first = Payment.objects.get(pk=self.payment.pk)
+        second = Payment.objects.get(pk=self.payment.pk)
+        self.assertTrue(first.mark_as_completed())
+        self.assertFalse(second.mark_as_completed())
+        self.assertFalse(second.mark_as_failed())
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'COMPLETED')
+        self.assertIsNotNone(self.payment.completed_at)
+
+    def test_disallowed_transition_is_rejected(self):
+        self.assertTrue(self.payment.mark_as_completed())
+        self.assertFalse(self.payment.mark_as_cancelled())
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'COMPLETED')
+
+    def test_winning_transition_sends_signal(self):
+        received = []
+
+        def receiver(sender, instance, old_status, **kwargs):
+            received.append((old_status, instance.status))
+
+        payment_status_changed.connect(receiver, sender=Payment)
+        self.addCleanup(payment_status_changed.disconnect, receiver, sender=Payment)
+        self.payment.mark_as_failed()
+        self.payment.mark_as_cancelled()  # not allowed from FAILED
+        self.assertEqual(received, [('PENDING', 'FAILED')])
+
+    def test_failed_payment_can_be_reopened_or_completed(self):
+        self.assertTrue(self.payment.mark_as_failed())
+        self.assertTrue(self.payment.reopen())
+        self.assertEqual(Payment.objects.get(pk=self.payment.pk).status, 'PENDING')
+
+        self.assertTrue(self.payment.mark_as_failed())
+        self.assertTrue(self.payment.mark_as_completed())
+        self.assertEqual(Payment.objects.get(pk=self.payment.pk).status, 'COMPLETED')
+
+
+# -------------------
+# Bulk import
+# -------------------
+class BulkImportBookingsTests(TestCase):
+    def setUp(self):
+        self.guest = User.objects.create(username='guest')
+        self.listing = make_listing(self.guest)
+
+    def item(self, check_in, check_out, **fields):
+        item = {'listing': str(self.listing.pk), 'guest': self.guest.pk,
+                'check_in': check_in, 'check_out': check_out}
+        item.update(fields)
+        return item
+
+    def test_overlap_within_batch_is_rejected(self):
+        results, created = bulk.import_bookings([
+            self.item('2030-01-01', '2030-01-05'),
+            self.item('2030-01-04', '2030-01-06'),
+            self.item('2030-01-05', '2030-01-07'),
+        ], mode=bulk.BEST_EFFORT)
+        self.assertEqual([r['status'] for r in results], ['created', 'invalid', 'created'])
+        self.assertEqual(len(created), 2)
+
+    def test_overlap_with_existing_booking_is_rejected(self):
+        make_booking(self.listing, self.guest, check_in=datetime.date(2030, 1, 1), nights=3)
+        results, _ = bulk.import_bookings(
+            [self.item('2030-01-02', '2030-01-03')], mode=bulk.BEST_EFFORT
+        )
+        self.assertEqual(results[0]['status'], 'invalid')
+
+    def test_atomic_mode_writes_nothing_on_error(self):
+        items = [self.item('2030-01-01', '2030-01-02'), self.item('2030-01-03', '2030-01-01')]
+        results, created = bulk.import_bookings(items, mode=bulk.ATOMIC)
+        self.assertEqual([r['status'] for r in results], ['skipped', 'invalid'])
+        self.assertEqual(created, [])
+        self.assertFalse(Booking.objects.exists())
+
+        results, created = bulk.import_bookings(items, mode=bulk.BEST_EFFORT)
+        self.assertEqual([r['status'] for r in results], ['created', 'invalid'])
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_malformed_items_are_reported_per_item(self):
+        results, created = bulk.import_bookings([
+            'not an object',
+            self.item(20300101, '2030-01-02'),
+            self.item(['x'], '2030-01-02'),
+            self.item('2030-01-01', '2030-01-02', listing=['x']),
+            self.item('2030-01-01', '2030-01-02', guest={'id': 1}),
+            self.item('2030-01-01', '2030-01-02'),
+        ], mode=bulk.BEST_EFFORT)
+        self.assertEqual([r['status'] for r in results], ['invalid'] * 5 + ['created'])
+        self.assertIn('check_in', results[1]['errors'])
+        self.assertIn('listing', results[3]['errors'])
+        self.assertEqual(len(created), 1)
+
+
+# -------------------
+# Fast serializers
+# -------------------
+class FastSerializerTests(TestCase):
+    def test_null_values_match_drf_output(self):
+        guest = User.objects.create(username='guest')
+        with self.captureOnCommitCallbacks(execute=True):
+            make_booking(make_listing(guest), guest)
+        summaries = BookingSummary.objects.all()
+        self.assertIsNone(summaries.get().amount)
+
+        encoder = compile_serializer(BookingSummarySerializer)
+        renderer = JSONRenderer()
+        self.assertEqual(
+            renderer.render(encoder.encode(summaries.values_list(*encoder.paths))),
+            renderer.render(BookingSummarySerializer(summaries, many=True).data),
+        )
+
+
+# -------------------
+# Bulkhead
+# -------------------
+class AdaptiveLimitTests(SimpleTestCase):
+    def test_slow_burst_halves_limit_once(self):
+        pool = AdaptiveLimit('test', initial_limit=8, max_limit=8, target_latency=0.01)
+        started = time.monotonic() - 1  # every response is slow
+        for _ in range(8):
+            self.assertTrue(pool.acquire())
+        for _ in range(8):
+            pool.release(started)
+        self.assertEqual(pool.limit, 4)
+
+        # A request admitted after the decrease may back off again
+        self.assertTrue(pool.acquire())
+        pool.release(time.monotonic(), failed=True)
+        self.assertEqual(pool.limit, 2)
+
+    def test_fast_responses_grow_limit(self):
+        pool = AdaptiveLimit('test', initial_limit=2, max_limit=4, target_latency=10)
+        for _ in range(10):
+            pool.acquire()
+            pool.release(time.monotonic())
+        self.assertEqual(pool.limit, 4)
+
+
+# -------------------
+# Booking summaries
+# -------------------
+class BookingSummaryTests(TestCase):
+    def setUp(self):
+        self.guest = User.objects.create(username='guest')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.booking = make_booking(make_listing(self.guest), self.guest)
+            self.payment = Payment.objects.create(
+                booking=self.booking, amount='200.00', first_name='Abebe', last_name='Kebede',
+                email='guest@example.com', chapa_tx_ref='tx-summary',
+            )
+
+    def test_stale_payment_save_keeps_current_status(self):
+        stale = Payment.objects.get(pk=self.payment.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(self.payment.mark_as_completed())
+        with self.captureOnCommitCallbacks(execute=True):
+            stale.verification_response = {'status': 'success'}
+            stale.save(update_fields=['verification_response', 'updated_at'])
+        self.assertEqual(BookingSummary.objects.get().payment_status, 'COMPLETED')
+
+    def test_my_bookings_lists_own_bookings(self):
+        client = APIClient()
+        client.force_authenticate(self.guest)
+        results = client.get('/my-bookings/').json()['results']
+        self.assertEqual([r['booking'] for r in results], [str(self.booking.pk)])
+        self.assertEqual(results[0]['payment_status'], 'PENDING')
+
+        client.force_authenticate(User.objects.create(username='other'))
+        self.assertEqual(client.get('/my-bookings/').json()['results'], [])
+
+
+# -------------------
+# Reviews
+# -------------------
+class ReviewTests(TestCase):
+    def setUp(self):
+        self.guest = User.objects.create(username='guest')
+        self.listing = make_listing(self.guest)
+        booking = make_booking(
+            self.listing, self.guest, check_in=datetime.date.today() - datetime.timedelta(days=5),
+            status='confirmed',
+        )
+        self.review = Review.objects.create(booking=booking, rating=5, comment='Lovely stay')
+
+    def assertAggregates(self, count, total):
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.review_count, self.listing.rating_sum), (count, total))
+
+    def test_only_the_author_can_delete(self):
+        moderation.moderate_pending_reviews()
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username='other'))
+        response = client.delete(f'/reviews/{self.review.pk}/')
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(Review.objects.filter(pk=self.review.pk).exists())
+
+        client.force_authenticate(self.guest)
+        self.assertEqual(client.delete(f'/reviews/{self.review.pk}/').status_code, 204)
+        self.assertAggregates(0, 0)
+
+    def test_delete_of_stale_instance_uses_current_counted_rating(self):
+        stale = Review.objects.get(pk=self.review.pk)
+        moderation.moderate_pending_reviews()
+        self.assertAggregates(1, 5)
+        stale.delete()
+        self.assertAggregates(0, 0)
+
+
+# -------------------
+# Archival
+# -------------------
+class ArchiveTests(TestCase):
+    def setUp(self):
+        archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(archive_dir.cleanup)
+        archive_settings = override_settings(ARCHIVE_DIR=archive_dir.name)
+        archive_settings.enable()
+        self.addCleanup(archive_settings.disable)
+
+        guest = User.objects.create(username='guest')
+        self.listing = make_listing(guest)
+        self.booking = make_booking(
+            self.listing, guest, check_in=datetime.date.today() - datetime.timedelta(days=5),
+            status='confirmed',
+        )
+        self.payment = Payment.objects.create(
+            booking=self.booking, amount='200.00', first_name='Abebe', last_name='Kebede',
+            email='guest@example.com', chapa_tx_ref='tx-old',
+        )
+        self.review = Review.objects.create(booking=self.booking, rating=4, comment='Lovely stay')
+        self.cutoff = timezone.now() + datetime.timedelta(minutes=1)
+
+    def settle(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.payment.mark_as_completed()
+        moderation.moderate_pending_reviews()
+
+    def test_archive_then_find(self):
+        self.settle()
+        counts = archive.archive_before(self.cutoff)
+        self.assertEqual(counts, {'bookings': 1, 'payments': 1, 'reviews': 1})
+        self.assertFalse(Booking.objects.exists())
+
+        self.assertEqual(archive.find_booking(self.booking.pk)['status'], 'confirmed')
+        self.assertEqual(archive.find_payment(chapa_tx_ref='tx-old')['status'], 'COMPLETED')
+        self.assertEqual(archive.find_review(self.review.pk)['rating'], 4)
+
+    def test_aggregates_survive_archival(self):
+        self.settle()
+        archive.archive_before(self.cutoff)
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.review_count, self.listing.rating_sum), (1, 4))
+
+    def test_open_payment_or_pending_review_is_kept(self):
+        moderation.moderate_pending_reviews()
+        self.assertEqual(archive.archive_before(self.cutoff), {})  # payment still PENDING
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.payment.mark_as_completed()
+        Review.objects.filter(pk=self.review.pk).update(moderation_status='pending')
+        self.assertEqual(archive.archive_before(self.cutoff), {})
+
+    def test_recently_updated_payment_is_kept(self):
+        self.settle()
+        Payment.objects.filter(pk=self.payment.pk).update(
+            updated_at=self.cutoff + datetime.timedelta(minutes=1)
+        )
+        self.assertEqual(archive.archive_before(self.cutoff), {})
+
+    def test_webhook_for_archived_payment_is_refused(self):
+        self.settle()
+        archive.archive_before(self.cutoff)
+        body = json.dumps({'tx_ref': 'tx-old', 'event': 'charge.refunded'}).encode()
+        signature = hmac.new(
+            views.CHAPA_WEBHOOK_SECRET.encode(), body, hashlib.sha256
+        ).hexdigest()
+        with self.assertLogs('listings.views', 'ERROR'):
+            response = self.client.post(
+                '/chapa-webhook/', body, content_type='application/json',
+                HTTP_X_CHAPA_SIGNATURE=signature,
+            )
+        self.assertEqual(response.status_code, 409)
@@ -1,43 +1,167 @@
 # listings/views.py
 import os
 import json
-import requests
+import logging
 import uuid
 import hmac
 import hashlib
+from datetime import date
 from decimal import Decimal
 from django.conf import settings
+from django.core.cache import cache
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.shortcuts import get_object_or_404, redirect
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
+from django.db import transaction
+from django.db.models import Q
 from django.urls import reverse
 from rest_framework import viewsets, status
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.pagination import CursorPagination
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import (
+    SAFE_METHODS, IsAdminUser, IsAuthenticated, IsAuthenticatedOrReadOnly
+)
 from rest_framework.response import Response
-from celery import shared_task
 
-from .models import Listing, Booking, Review, Payment
-from .serializers import ListingSerializer, BookingSerializer, ReviewSerializer, PaymentSerializer
+from . import archive, bulk, outbox, summaries
+from .fast_serializers import FastListMixin
+from .models import Listing, Booking, BookingSummary, Review, Payment
+from .parsers import NDJSONParser
+from .serializers import (
+    ListingSerializer, BookingSerializer, BookingSummarySerializer, ReviewSerializer, PaymentSerializer
+)
+
+logger = logging.getLogger(__name__)
 
 # -------------------
 # API ViewSets
 # -------------------
-class ListingViewSet(viewsets.ModelViewSet):
+BULK_PARSERS = [JSONParser, NDJSONParser]
+# Bulk import writes rows for arbitrary host/guest ids; partner (staff) accounts only
+BULK_PERMISSIONS = [IsAdminUser]
+
+
+def _bulk_import(request, importer):
+    """Shared handler for the bulk endpoints; accepts a JSON array or NDJSON"""
+    items = request.data
+    if isinstance(items, dict):
+        items = items.get('items')
+    if not isinstance(items, list):
+        return Response({'error': 'Expected a list of items'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > settings.BULK_IMPORT_MAX_ITEMS:
+        return Response({'error': f'At most {settings.BULK_IMPORT_MAX_ITEMS} items per request'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    mode = request.query_params.get('mode', bulk.ATOMIC)
+    if mode not in bulk.MODES:
+        return Response({'error': f"mode must be one of {', '.join(bulk.MODES)}"},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    results, created = importer(items, mode)
+    if len(created) == len(items):
+        response_status = status.HTTP_201_CREATED
+    elif not created:
+        response_status = status.HTTP_400_BAD_REQUEST
+    else:
+        response_status = status.HTTP_207_MULTI_STATUS
+    return Response({
+        'mode': mode,
+        'created': len(created),
+        'failed': len(items) - len(created),
+        'results': results,
+    }, status=response_status)
+
+
+class ListingViewSet(FastListMixin, viewsets.ModelViewSet):
     queryset = Listing.objects.all()
     serializer_class = ListingSerializer
 
-class BookingViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """Top-k similar listings from the precomputed recommendation index"""
+        from .recommendations import similar_listings
+
+        listing = self.get_object()
+        try:
+            k = min(max(int(request.query_params.get('k', 10)), 1), 50)
+        except ValueError:
+            return Response({'error': 'k must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        ranked = similar_listings(listing.pk, k)
+        listings = Listing.objects.in_bulk([listing_id for listing_id, _ in ranked])
+        results = []
+        for listing_id, score in ranked:
+            match = listings.get(uuid.UUID(listing_id))
+            if match is not None:
+                results.append({'score': round(score, 4), 'listing': ListingSerializer(match).data})
+        return Response({'listing_id': listing.pk, 'results': results}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'], url_path='bulk', parser_classes=BULK_PARSERS,
+            permission_classes=BULK_PERMISSIONS)
+    def bulk_import(self, request):
+        """Import many listings at once (?mode=atomic|best_effort)"""
+        return _bulk_import(request, bulk.import_listings)
+
+    @action(detail=False, methods=['get'])
+    def calendar(self, request):
+        """Day-by-day occupancy for ?ids=<uuid>,<uuid>&from=YYYY-MM-DD&to=YYYY-MM-DD"""
+        from . import occupancy
+
+        try:
+            listing_ids = [uuid.UUID(i) for i in request.query_params.get('ids', '').split(',') if i]
+            date_from = date.fromisoformat(request.query_params['from'])
+            date_to = date.fromisoformat(request.query_params['to'])
+        except (KeyError, ValueError):
+            return Response({'error': 'ids, from and to (YYYY-MM-DD) are required'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not listing_ids or len(listing_ids) > occupancy.MAX_LISTINGS:
+            return Response({'error': f'Between 1 and {occupancy.MAX_LISTINGS} ids are required'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not occupancy.in_window(occupancy.current_window_start(), date_from, date_to):
+            return Response({'error': 'Date range is outside the calendar window'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        ids, days, free = occupancy.calendar(listing_ids, date_from, date_to)
+        return Response({
+            'from': date_from,
+            'to': date_to,
+            'listings': [
+                {
+                    'listing_id': listing_id,
+                    'occupancy': ''.join('1' if booked else '0' for booked in row),
+                    'available': bool(is_free),
+                }
+                for listing_id, row, is_free in zip(ids, days.tolist(), free.tolist())
+            ],
+        }, status=status.HTTP_200_OK)
+
+class BookingViewSet(FastListMixin, viewsets.ModelViewSet):
     queryset = Booking.objects.all()
     serializer_class = BookingSerializer
 
-class ReviewViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'], url_path='bulk', parser_classes=BULK_PARSERS,
+            permission_classes=BULK_PERMISSIONS)
+    def bulk_import(self, request):
+        """Import many bookings at once (?mode=atomic|best_effort)"""
+        return _bulk_import(request, bulk.import_bookings)
+
+class ReviewViewSet(FastListMixin, viewsets.ModelViewSet):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # Only the author may edit or delete a review
+        if self.request.method not in SAFE_METHODS:
+            return queryset.filter(booking__guest=self.request.user)
+        # Pending and rejected reviews are only visible to their author
+        visible = Q(moderation_status='approved')
+        if self.request.user.is_authenticated:
+            visible |= Q(booking__guest=self.request.user)
+        return queryset.filter(visible)
 
 # -------------------
 # Chapa Payment Configuration
@@ -55,41 +179,6 @@ def get_chapa_headers():
         'Content-Type': 'application/json'
     }
 
-# -------------------
-# Celery Tasks
-# -------------------
-@shared_task
-def send_payment_confirmation_email(booking_id, payment_id):
-    """Send payment confirmation email using Celery"""
-    try:
-        booking = Booking.objects.get(id=booking_id)
-        payment = Payment.objects.get(id=payment_id)
-        
-        subject = f'Payment Confirmed - Booking #{booking.id}'
-        
-        context = {
-            'booking': booking,
-            'payment': payment,
-            'listing': booking.listing,
-            'user': booking.user
-        }
-        
-        html_message = render_to_string('emails/payment_confirmation.html', context)
-        plain_message = strip_tags(html_message)
-        
-        send_mail(
-            subject,
-            plain_message,
-            'noreply@alxtravel.com',
-            [booking.user.email],
-            html_message=html_message,
-            fail_silently=False,
-        )
-        
-        return f"Email sent to {booking.user.email}"
-    except Exception as e:
-        return f"Failed to send email: {str(e)}"
-
 # -------------------
 # Payment Views
 # -------------------
@@ -109,6 +198,14 @@ def initiate_payment(request):
     except Booking.DoesNotExist:
         return Response({'error': 'Booking not found'}, status=status.HTTP_404_NOT_FOUND)
     
+    return start_chapa_payment(request, booking)
+
+def start_chapa_payment(request, booking):
+    """
+    Create or reuse the booking's payment and initialize it with Chapa
+    """
+    import requests
+
     # Check if payment already exists
     if hasattr(booking, 'payment'):
         payment = booking.payment
@@ -121,6 +218,18 @@ def initiate_payment(request):
                 'payment': PaymentSerializer(payment).data,
                 'checkout_url': f"https://checkout.chapa.co/checkout/payment/{payment.chapa_tx_ref}"
             }, status=status.HTTP_200_OK)
+        elif payment.status == 'FAILED':
+            # Retry a failed payment with a fresh transaction reference
+            if not payment.reopen():
+                payment.refresh_from_db()
+                return Response({
+                    'error': 'Payment status changed, please retry',
+                    'payment': PaymentSerializer(payment).data
+                }, status=status.HTTP_409_CONFLICT)
+        else:
+            return Response({
+                'error': f'Payment is {payment.status.lower()} and cannot be retried'
+            }, status=status.HTTP_400_BAD_REQUEST)
     else:
         # Create new payment record
         payment = Payment.objects.create(
@@ -135,7 +244,7 @@ def initiate_payment(request):
     # Prepare data for Chapa
     tx_ref = str(uuid.uuid4())
     payment.chapa_tx_ref = tx_ref
-    payment.save()
+    payment.save(update_fields=['chapa_tx_ref', 'updated_at'])
     
     callback_url = request.build_absolute_uri(reverse('verify-payment', args=[payment.id]))
     
@@ -171,7 +280,7 @@ def initiate_payment(request):
             
             # Store the response
             payment.chapa_response = chapa_response
-            payment.save()
+            payment.save(update_fields=['chapa_response', 'updated_at'])
             
             if chapa_response.get('status') == 'success':
                 checkout_url = chapa_response['data']['checkout_url']
@@ -195,6 +304,14 @@ def initiate_payment(request):
         return Response({'error': f'Payment service error: {str(e)}'}, 
                       status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
+def archived_payment_data(archived):
+    """
+    An archived payment row in PaymentSerializer's shape, without the raw
+    gateway responses the serializer leaves out
+    """
+    data = dict(archived, booking=archived.get('booking_id'), booking_details=None)
+    return {name: data.get(name) for name in PaymentSerializer.Meta.fields}
+
 @api_view(['GET'])
 def verify_payment(request, payment_id):
     """
@@ -203,7 +320,13 @@ def verify_payment(request, payment_id):
     try:
         payment = Payment.objects.get(id=payment_id)
     except Payment.DoesNotExist:
-        return Response({'error': 'Payment not found'}, status=status.HTTP_404_NOT_FOUND)
+        archived = archive.find_payment(payment_id=payment_id)
+        if archived is None:
+            return Response({'error': 'Payment not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            'message': 'Payment is archived',
+            'payment': archived_payment_data(archived)
+        }, status=status.HTTP_200_OK)
     
     if payment.status == 'COMPLETED':
         return Response({
@@ -211,6 +334,8 @@ def verify_payment(request, payment_id):
             'payment': PaymentSerializer(payment).data
         }, status=status.HTTP_200_OK)
     
+    import requests
+
     try:
         # Verify with Chapa API
         verify_url = f"{CHAPA_VERIFY_URL}/{payment.chapa_tx_ref}"
@@ -221,17 +346,26 @@ def verify_payment(request, payment_id):
             
             # Store verification response
             payment.verification_response = verification_data
-            payment.save()
+            payment.save(update_fields=['verification_response', 'updated_at'])
             
             if verification_data.get('status') == 'success':
                 chapa_data = verification_data.get('data', {})
                 
                 # Check if payment was successful
                 if chapa_data.get('status') == 'success':
-                    payment.mark_as_completed()
+                    # Only the call that wins the transition queues the email
+                    with transaction.atomic():
+                        if payment.mark_as_completed():
+                            outbox.enqueue_payment_completed(payment)
+                        else:
+                            payment.refresh_from_db()
                     
-                    # Send confirmation email using Celery
-                    send_payment_confirmation_email.delay(payment.booking.id, payment.id)
+                    # Lost to a concurrent call, or the payment was cancelled
+                    if payment.status != 'COMPLETED':
+                        return Response({
+                            'error': f'Payment is {payment.status.lower()} and cannot be completed',
+                            'payment': PaymentSerializer(payment).data
+                        }, status=status.HTTP_409_CONFLICT)
                     
                     return Response({
                         'message': 'Payment verified successfully',
@@ -258,6 +392,36 @@ def verify_payment(request, payment_id):
             'error': f'Verification service error: {str(e)}'
         }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
+class MyBookingsPagination(CursorPagination):
+    # Keyset pagination over the (guest, -created_at) index: no OFFSET scans
+    ordering = '-created_at'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def my_bookings(request):
+    """
+    Booking history of the current user, newest first, served from
+    BookingSummary rows and cached per user until one of them changes
+    """
+    version = summaries.cache_version(request.user.pk)
+    page_key = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    cache_key = f'my-bookings:{request.user.pk}:{version}:{page_key}'
+    data = cache.get(cache_key)
+    if data is None:
+        paginator = MyBookingsPagination()
+        page = paginator.paginate_queryset(
+            BookingSummary.objects.filter(guest=request.user), request
+        )
+        data = paginator.get_paginated_response(
+            BookingSummarySerializer(page, many=True).data
+        ).data
+        cache.set(cache_key, data, settings.MY_BOOKINGS_CACHE_TIMEOUT)
+    return Response(data, status=status.HTTP_200_OK)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def payment_success(request):
@@ -324,15 +488,23 @@ def chapa_webhook(request):
         try:
             payment = Payment.objects.get(chapa_tx_ref=tx_ref)
         except Payment.DoesNotExist:
+            # Only settled payments are archived, so a webhook for one needs a
+            # human look; refuse it so Chapa keeps it visible as undelivered
+            if archive.find_payment(chapa_tx_ref=tx_ref) is not None:
+                logger.error('Chapa webhook %r for archived payment %s', data.get('event'), tx_ref)
+                return JsonResponse(
+                    {'status': 'archived', 'error': 'Payment is archived'}, status=409
+                )
             return JsonResponse({'error': 'Payment not found'}, status=404)
         
         # Update payment based on webhook data
         event = data.get('event')
         
         if event == 'charge.success':
-            payment.mark_as_completed()
-            # Send confirmation email
-            send_payment_confirmation_email.delay(payment.booking.id, payment.id)
+            # Only the call that wins the transition queues the email
+            with transaction.atomic():
+                if payment.mark_as_completed():
+                    outbox.enqueue_payment_completed(payment)
         elif event == 'charge.failed':
             payment.mark_as_failed()
         
@@ -355,18 +527,7 @@ def create_booking_with_payment(request):
         booking = serializer.save(user=request.user)
         
         # Initiate payment
-        payment_data = {
-            'booking_id': booking.id
-        }
-        
-        # Create a mock request object for initiate_payment
-        from rest_framework.test import APIRequestFactory
-        factory = APIRequestFactory()
-        payment_request = factory.post('/initiate-payment/', payment_data, format='json')
-        payment_request.user = request.user
-        
-        # Call initiate_payment
-        response = initiate_payment(payment_request)
+        response = start_chapa_payment(request, booking)
         
         if response.status_code == 200:
             return Response({
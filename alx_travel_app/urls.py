@@ -1,7 +1,7 @@
 # listings/urls.py
 from django.urls import path
 from rest_framework.routers import DefaultRouter
-from . import views
+from listings import views
 
 # Create a router for ViewSets
 router = DefaultRouter()
@@ -27,6 +27,11 @@ payment_urlpatterns = [
     path('payment-status/<int:booking_id>/', 
          views.payment_status, 
          name='payment-status'),
+
+    # Booking history of the current user
+    path('my-bookings/', 
+         views.my_bookings, 
+         name='my-bookings'),
     
     # Combined booking and payment
     path('create-booking-with-payment/', 